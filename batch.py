@@ -0,0 +1,146 @@
+import argparse
+import logging
+import os
+import random
+
+from main import B30Render
+from tools.assets import LayoutAssets
+from tools.encoder import BackgroundWriter, OutputEncoder
+from tools.instrument import log_event, peak_rss_mb, setup_logging
+from tools.layout import LayoutSpec
+from tools.parallel import create_pool, render_cards
+
+
+def read_accounts(file_path):
+    """
+    讀取帳號清單，格式與 user.txt 相同，每兩行為一組帳號與密碼
+    """
+    with open(file_path, 'r') as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    return [(lines[i], lines[i + 1]) for i in range(0, len(lines) - 1, 2)]
+
+
+def make_jobs(score_paths=(), accounts=(), out_dir='output', bg_names=None, layout=None, encoder=None):
+    """
+    建立渲染工作，背景在主程序中先行決定，平行與逐張渲染的結果相同
+    """
+    bg_names = bg_names or sorted(os.listdir('src/bg_img'))
+    encoder = encoder or OutputEncoder()
+    jobs = []
+    for score_path in score_paths:
+        out_path = os.path.join(out_dir, f'{os.path.splitext(os.path.basename(score_path))[0]}{encoder.extension}')
+        jobs.append({'score_path': score_path, 'out_path': out_path, 'bg_name': random.choice(bg_names), 'layout': layout,
+                     'encoder': encoder})
+    for credentials in accounts:
+        jobs.append({'credentials': credentials, 'out_path': None, 'out_dir': out_dir, 'bg_name': random.choice(bg_names), 'layout': layout,
+                     'encoder': encoder})
+    return jobs
+
+
+def render_batch(score_paths=(), accounts=(), out_dir='output', assets=None, workers=1, tiles=False, backend='selenium',
+                 layout=None, encoder=None, incremental=False, batch_effects=False, jacket_url_template=None):
+    """
+    在同一個程序中渲染多張 B30 卡片，字體與版面素材只載入一次
+    :param score_paths: 離線成績 csv 路徑
+    :param accounts: 線上帳號 (username, password)
+    :param workers: 大於 1 時使用多個程序平行渲染
+    :param tiles: 平行模式下改為逐張渲染，每張卡片的 info box 分給各程序繪製
+    :param backend: 線上成績取得方式，'selenium' 或 'http'
+    :param jacket_url_template: http 模式的封面網址格式，見 B30Render
+    :param layout: 卡片版面 LayoutSpec，None 時為預設的 Best 30
+    :param encoder: 輸出格式 OutputEncoder，逐張渲染時在背景 thread 編碼，同時渲染下一張
+    :param incremental: 輸出檔案已存在時只重繪成績有變動的 info box
+    :param batch_effects: 以 numpy 一次處理所有未快取封面的模糊與調暗 (結果與 PIL 相同)
+    :return: 成功輸出的檔案路徑
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    assets = assets or LayoutAssets()
+    jobs = make_jobs(score_paths, accounts, out_dir, assets.bg_names, layout, encoder)
+    for job in jobs:
+        job['incremental'] = incremental
+    render_kwargs = {'fetch_backend': backend, 'batch_effects': batch_effects, 'jacket_url_template': jacket_url_template}
+    render = B30Render(assets=assets, **render_kwargs)
+
+    if accounts and backend == 'selenium':
+        # 以共用的瀏覽器 pool 同時抓取所有帳號
+        from tools.browser_pool import DriverPool, fetch_many
+
+        with DriverPool(render.chrome_options, size=max(workers, 1)) as pool:
+            profiles = fetch_many(pool, accounts, render.fetch_timeouts)
+
+        online_jobs = [job for job in jobs if job.get('credentials') is not None]
+        for job, profile in zip(online_jobs, profiles):
+            if isinstance(profile, Exception):
+                log_event('fetch_failed', logging.ERROR, user=job['credentials'][0], error=str(profile))
+                jobs.remove(job)
+            else:
+                job['profile'] = profile
+                job['out_path'] = os.path.join(out_dir, f"{profile['username']}{job['encoder'].extension}")
+
+    if workers > 1 and not tiles:
+        out_paths = render_cards(jobs, workers, **render_kwargs)
+        return [out_path for out_path in out_paths if out_path]
+
+    executor = create_pool(workers, **render_kwargs) if workers > 1 else None
+    writer = BackgroundWriter(encoder)
+
+    try:
+        for job in jobs:
+            b30_img = render.generate_b30(
+                isOnline=job.get('credentials') is not None,
+                score_path=job.get('score_path'),
+                credentials=job.get('credentials'),
+                bg_name=job['bg_name'],
+                executor=executor,
+                profile=job.get('profile'),
+                layout=job['layout'],
+                previous=job['out_path'] if incremental else None,
+            )
+            if not b30_img:
+                continue
+            out_path = job['out_path'] or os.path.join(out_dir, f'{render.username}{writer.encoder.extension}')
+            writer.submit(b30_img, out_path, render.render_state)
+        return writer.wait()
+    finally:
+        writer.close()
+        if executor:
+            executor.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render B30 cards for multiple players')
+    parser.add_argument('scores', nargs='*', help='offline score csv or json files')
+    parser.add_argument('--accounts', help='account file, username and password on alternating lines')
+    parser.add_argument('--out-dir', default='output')
+    parser.add_argument('--workers', type=int, default=1, help='number of render processes')
+    parser.add_argument('--backend', choices=['selenium', 'http'], default='selenium')
+    parser.add_argument('--jacket-url-template', help='cover url for the http backend, e.g. .../{song_id}.jpg')
+    parser.add_argument('--template-dir', help='also cache the static card backgrounds on disk')
+    parser.add_argument('--tiles', action='store_true', help='split the info boxes of each card across workers')
+    parser.add_argument('--best', type=int, default=30, help='number of boxes to draw, e.g. 40 or 50')
+    parser.add_argument('--scale', type=float, default=1.0, help='render scale, < 1 for a fast preview')
+    parser.add_argument('--format', choices=['png', 'jpeg', 'webp'], default='png', help='output image format')
+    parser.add_argument('--compress-level', type=int, default=6, help='png compression level, 0 (fast) ~ 9 (small)')
+    parser.add_argument('--quality', type=int, default=90, help='jpeg / lossy webp quality')
+    parser.add_argument('--lossless', action='store_true', help='lossless webp')
+    parser.add_argument('--incremental', action='store_true', help='only redraw boxes that changed since the last run')
+    parser.add_argument('--batch-effects', action='store_true', help='blur and darken uncached covers in one numpy pass')
+    parser.add_argument('--log-json', action='store_true', help='emit structured json logs')
+    args = parser.parse_args()
+
+    setup_logging(json_format=args.log_json)
+
+    accounts = read_accounts(args.accounts) if args.accounts else []
+    assets = LayoutAssets(TEMPLATE_DIR=args.template_dir)
+    out_paths = render_batch(args.scores, accounts, args.out_dir, assets=assets, workers=args.workers, tiles=args.tiles,
+                              backend=args.backend, layout=LayoutSpec.best(args.best, scale=args.scale),
+                              encoder=OutputEncoder(args.format, compress_level=args.compress_level, quality=args.quality,
+                                                    lossless=args.lossless),
+                              incremental=args.incremental, batch_effects=args.batch_effects,
+                              jacket_url_template=args.jacket_url_template)
+    for out_path in out_paths:
+        print(out_path)
+    # 多程序時 worker_peak_rss_mb 為單一 worker 的最大值
+    log_event('batch_complete', cards=len(out_paths), peak_rss_mb=peak_rss_mb(), worker_peak_rss_mb=peak_rss_mb(children=True))
@@ -0,0 +1,72 @@
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.fixtures import make_fixtures
+from tools.cover_cache import make_cover_tile, make_cover_tiles
+from tools.layout import LayoutSpec
+
+
+def load_covers(n=30, fixture_dir='benchmarks/.fixtures'):
+    paths, _ = make_fixtures(fixture_dir)
+    covers = []
+    for path in sorted(glob.glob(os.path.join(paths['COVER_IMG_DIR'], '*.jpg')))[:n]:
+        cover_img = Image.open(path)
+        cover_img.load()
+        covers.append(cover_img)
+    return covers
+
+
+def tile_params(layout):
+    # 與 B30Render.set_layout 相同
+    return {'box_size': (layout.box_width, layout.box_height), 'crop_top': layout.s(10), 'blur_radius': 3 * layout.scale}
+
+
+def max_difference(tiles_a, tiles_b):
+    return max(int(np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)).max())
+               for a, b in zip(tiles_a, tiles_b))
+
+
+def run_benchmark(covers, layout, iterations=10):
+    """
+    以 PIL 逐張處理與 numpy 批次處理同一批封面
+    :return: {'pil_ms': 中位數, 'numpy_ms': 中位數, 'max_diff': 兩者最大的像素差}
+    """
+    params = tile_params(layout)
+    timings = {'pil_ms': [], 'numpy_ms': []}
+    for _ in range(iterations):
+        start = time.perf_counter()
+        pil_tiles = [make_cover_tile(cover_img, **params) for cover_img in covers]
+        timings['pil_ms'].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        numpy_tiles = make_cover_tiles(covers, **params)
+        timings['numpy_ms'].append((time.perf_counter() - start) * 1000)
+
+    result = {name: round(statistics.median(values), 2) for name, values in timings.items()}
+    result['max_diff'] = max_difference(pil_tiles, numpy_tiles)
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the PIL and batched numpy cover tile effects')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--covers', type=int, default=30)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5, 0.25, 1.5, 2.0])
+    parser.add_argument('--tolerance', type=int, default=0, help='allowed per-channel difference from PIL')
+    args = parser.parse_args()
+
+    covers = load_covers(args.covers)
+    failed = False
+    print(f"{'scale':<8}{'pil ms':>10}{'numpy ms':>10}{'max diff':>10}")
+    for scale in args.scales:
+        result = run_benchmark(covers, LayoutSpec(scale=scale), args.iterations)
+        print(f"{scale:<8}{result['pil_ms']:>10.2f}{result['numpy_ms']:>10.2f}{result['max_diff']:>10}")
+        failed = failed or result['max_diff'] > args.tolerance
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,170 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import tracemalloc
+
+import numpy as np
+import PIL
+
+from benchmarks.fixtures import make_fixtures
+from main import B30Render
+from tools.encoder import OutputEncoder
+from tools.instrument import peak_rss_mb
+from tools.layout import LayoutSpec
+from tools.parallel import create_pool
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def run_once(render, score_path, bg_name, layout, encoder, **options):
+    """
+    以 generate_b30 執行一次離線渲染並編碼，回傳 render.metrics 記錄的各階段耗時 (秒)
+    :param options: 傳給 generate_b30 的 pipeline、executor、previous 等參數
+    """
+    render.generate_b30_bytes(encoder, isOnline=False, score_path=score_path, bg_name=bg_name, layout=layout,
+                              **options)
+    return dict(render.metrics.timings)
+
+
+def make_previous(render, score_path, bg_name, layout, fixture_dir):
+    """
+    以改動第一筆成績 P 數的資料產生上一張卡片，增量渲染時只需重繪該格
+    :return: 上一張卡片的路徑
+    """
+    with open(score_path, 'r', newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    rows[1][rows[0].index('P')] = str(int(rows[1][rows[0].index('P')]) + 1)
+
+    prev_score_path = os.path.join(fixture_dir, 'score_previous.csv')
+    with open(prev_score_path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+    prev_path = os.path.join(fixture_dir, 'previous.png')
+    encoder = OutputEncoder('png', compress_level=1)
+    render.save_b30(render.generate_b30(isOnline=False, score_path=prev_score_path, bg_name=bg_name, layout=layout),
+                    prev_path, encoder)
+    return prev_path
+
+
+def run_benchmark(iterations=20, warmup=2, layout=None, encoder=None, fixture_dir='benchmarks/.fixtures',
+                  pipeline=False, workers=1, incremental=False):
+    """
+    :param workers: 大於 1 時以 ProcessPoolExecutor 平行繪製 info box
+    :param incremental: 沿用上一張卡片，只重繪變動的 info box
+    :return: {'stages': {stage: {'p50': ms, 'p95': ms}}, 'peak_python_mb': ..., 'peak_rss_mb': ...}
+    """
+    paths, score_path = make_fixtures(fixture_dir)
+    layout = layout or LayoutSpec()
+    encoder = encoder or OutputEncoder()
+
+    render = B30Render(**paths)
+    bg_name = render.assets.bg_names[0]
+
+    options = {'pipeline': pipeline}
+    if incremental:
+        options['previous'] = make_previous(render, score_path, bg_name, layout, fixture_dir)
+    executor = create_pool(workers, **paths) if workers > 1 else None
+    options['executor'] = executor
+
+    try:
+        # 第一次會建立封面 tile 與底圖快取，不列入統計
+        for _ in range(warmup):
+            run_once(render, score_path, bg_name, layout, encoder, **options)
+
+        # 階段依實際執行的路徑而異 (例如增量渲染的 load_previous、redraw)，以第一次出現的順序列出
+        samples = {}
+        for _ in range(iterations):
+            for name, seconds in run_once(render, score_path, bg_name, layout, encoder, **options).items():
+                samples.setdefault(name, []).append(seconds * 1000)
+
+        # tracemalloc 會拖慢執行，另外跑一次量測 python heap 峰值
+        tracemalloc.start()
+        run_once(render, score_path, bg_name, layout, encoder, **options)
+        _, peak_python = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    result = {
+        'stages': {name: {'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95))}
+                   for name, values in samples.items()},
+        'peak_python_mb': round(peak_python / 2 ** 20, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'iterations': iterations,
+        'layout': repr(layout),
+        'format': encoder.format,
+        'mode': {'pipeline': pipeline, 'workers': workers, 'incremental': incremental},
+        'env': {'python': platform.python_version(), 'pillow': PIL.__version__, 'platform': platform.platform()},
+    }
+    return result
+
+
+def compare(result, baseline, tolerance=0.2, min_ms=1.0):
+    """
+    與基準比較 p50，變慢超過 tolerance 且超過 min_ms 的階段視為退步
+    :return: [(stage, 基準 ms, 目前 ms)]
+    """
+    regressions = []
+    for name, stats in result['stages'].items():
+        if name not in baseline['stages']:
+            continue
+        base = baseline['stages'][name]['p50']
+        if stats['p50'] > base * (1 + tolerance) and stats['p50'] - base > min_ms:
+            regressions.append((name, base, stats['p50']))
+    return regressions
+
+
+def print_report(result, baseline=None):
+    print(f"{'stage':<20}{'p50 ms':>10}{'p95 ms':>10}{'base p50':>10}")
+    for name, stats in result['stages'].items():
+        base = baseline['stages'].get(name, {}).get('p50') if baseline else None
+        base = f'{base:.2f}' if base is not None else '-'
+        print(f"{name:<20}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{base:>10}")
+    print(f"peak python heap: {result['peak_python_mb']} MB, peak rss: {result['peak_rss_mb']} MB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark each stage of the offline render pipeline')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--best', type=int, default=30)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--format', choices=['png', 'jpeg', 'webp'], default='png')
+    parser.add_argument('--pipeline', action='store_true', help='load covers in the background while drawing')
+    parser.add_argument('--workers', type=int, default=1, help='draw the info boxes in this many processes')
+    parser.add_argument('--incremental', action='store_true', help='redraw only the changed box of a previous card')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p50 slowdown before failing')
+    parser.add_argument('--json', help='also write the result to this file')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.iterations, args.warmup, LayoutSpec.best(args.best, scale=args.scale),
+                           OutputEncoder(args.format), pipeline=args.pipeline, workers=args.workers,
+                           incremental=args.incremental)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'baseline saved to {args.baseline}')
+    elif baseline and baseline.get('mode') != result['mode']:
+        print(f"baseline was measured with {baseline.get('mode')}, skipping the comparison")
+    elif baseline:
+        regressions = compare(result, baseline, args.tolerance)
+        for name, base, current in regressions:
+            print(f'REGRESSION {name}: {base:.2f} ms -> {current:.2f} ms')
+        sys.exit(1 if regressions else 0)
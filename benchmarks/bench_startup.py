@@ -0,0 +1,78 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fixtures import make_fixtures
+
+# 線上模式才需要的模組，離線渲染結束後不應出現在 sys.modules
+ONLINE_MODULES = ['requests', 'selenium', 'tools.browser_pool', 'tools.web_client', 'tools.downloader', 'tools.song_wiki']
+
+# 在新的直譯器中執行，量測 import main 與第一張離線卡片的耗時
+CHILD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from main import B30Render
+imported = time.perf_counter()
+render = B30Render(**json.loads(sys.argv[1]))
+created = time.perf_counter()
+render.generate_b30(isOnline=False, score_path=sys.argv[2], bg_name=render.assets.bg_names[0])
+rendered = time.perf_counter()
+print(json.dumps({
+    'import_main': imported - start,
+    'create_render': created - imported,
+    'first_card': rendered - created,
+    'online_modules': [name for name in json.loads(sys.argv[3]) if name in sys.modules],
+}))
+'''
+
+
+def run_once(paths, score_path):
+    """
+    :return: 各階段耗時 (秒)，含直譯器啟動在內的整體耗時為 'process'
+    """
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD_SCRIPT, json.dumps(paths), score_path, json.dumps(ONLINE_MODULES)],
+                            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.perf_counter() - start
+    return result
+
+
+def run_benchmark(iterations=5, fixture_dir='benchmarks/.fixtures'):
+    """
+    :return: {'stages': {stage: 中位數 ms}, 'online_modules': [...]}
+    """
+    paths, score_path = make_fixtures(fixture_dir)
+    # 第一次會建立封面 tile 與底圖快取，不列入統計
+    run_once(paths, score_path)
+
+    samples = [run_once(paths, score_path) for _ in range(iterations)]
+    stages = ['import_main', 'create_render', 'first_card', 'process']
+    return {
+        'stages': {name: round(statistics.median(sample[name] for sample in samples) * 1000, 2) for name in stages},
+        'online_modules': sorted({name for sample in samples for name in sample['online_modules']}),
+        'iterations': iterations,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure cold start time of an offline render')
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--json', help='also write the result to this file')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.iterations)
+    print(f"{'stage':<20}{'median ms':>10}")
+    for name, ms in result['stages'].items():
+        print(f'{name:<20}{ms:>10.2f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if result['online_modules']:
+        print(f"online-only modules imported: {', '.join(result['online_modules'])}")
+        sys.exit(1)
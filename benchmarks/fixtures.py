@@ -0,0 +1,90 @@
+import csv
+import os
+import random
+import shutil
+
+from PIL import Image, ImageDraw
+
+from tools.song_store import DIFFICULTIES, SongConstantStore
+from tools.utils import get_grade
+
+FIXTURE_VERSION = 1
+
+
+def make_fixtures(root='benchmarks/.fixtures', n_songs=300, n_scores=40, seed=0, force=False):
+    """
+    產生離線渲染需要的假資料: 成績 csv、定數表、封面、頭像、名牌與 ptt 框
+    同樣的參數只產生一次
+    :return: B30Render 的路徑參數與成績 csv 路徑
+    """
+    stamp_path = os.path.join(root, '.stamp')
+    stamp = repr((FIXTURE_VERSION, n_songs, n_scores, seed))
+    paths = {
+        'COVER_IMG_DIR': os.path.join(root, 'cover_img'),
+        'AVATAR_IMG_DIR': os.path.join(root, 'avatar_img'),
+        'BANNER_IMG_DIR': os.path.join(root, 'banner_img'),
+        'RATING_IMG_DIR': os.path.join(root, 'rating_img'),
+        'SONG_DATA_PATH': os.path.join(root, 'arcaea_song_level.sqlite'),
+    }
+    score_path = os.path.join(root, 'score.csv')
+
+    if not force and os.path.exists(stamp_path):
+        with open(stamp_path, 'r') as f:
+            if f.read() == stamp:
+                return paths, score_path
+
+    shutil.rmtree(root, ignore_errors=True)
+    for key, path in paths.items():
+        if key.endswith('_DIR'):
+            os.makedirs(path)
+
+    rng = random.Random(seed)
+    titles = [f'Song {i:03d}' for i in range(n_songs - 1)] + ['A very long song title that overflows the box']
+
+    # 定數表
+    song_rows = []
+    for title in titles:
+        constants = [round(rng.uniform(1, 12), 1) for _ in DIFFICULTIES]
+        # 部分歌曲沒有 BYD / ETR 譜面
+        if rng.random() < 0.7:
+            constants[3] = ''
+        if rng.random() < 0.9:
+            constants[4] = ''
+        song_rows.append([title] + constants)
+    SongConstantStore(paths['SONG_DATA_PATH']).replace(song_rows)
+
+    # 成績 csv (前 30 筆為 B30，後 10 筆為 R10)
+    with open(score_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['difficulty', 'title', 'artist', 'grade', 'score', 'date', 'P', 'F', 'L'])
+        for song_row in rng.sample(song_rows, n_scores):
+            difficulty = rng.choice([diff for diff, lv in zip(DIFFICULTIES, song_row[1:]) if lv != ''])
+            score = rng.randint(9_200_000, 10_002_000)
+            year, month, day = rng.randint(2020, 2024), rng.randint(1, 12), rng.randint(1, 28)
+            hour, minute = rng.randint(1, 12), rng.randint(0, 59)
+            if rng.random() < 0.5:
+                # windows 格式
+                date = f"{year}/{month:02d}/{day:02d} {rng.choice(['上午', '下午'])}{hour}:{minute:02d}"
+            else:
+                date = f"{month:02d}/{day:02d}/{year} {hour}:{minute:02d} {rng.choice(['AM', 'PM'])}"
+            writer.writerow([difficulty, song_row[0], 'artist', get_grade(f'{score:,}'), f'{score:,}', date,
+                             rng.randint(500, 1500), rng.randint(0, 9), rng.randint(0, 9)])
+
+    # 封面
+    for title in titles:
+        cover = Image.new('RGB', (512, 512), tuple(rng.randint(0, 255) for _ in range(3)))
+        draw = ImageDraw.Draw(cover)
+        draw.ellipse([64, 64, 448, 448], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        draw.text((100, 240), title, fill=(0, 0, 0))
+        cover.save(os.path.join(paths['COVER_IMG_DIR'], f'{title}.jpg'), quality=90)
+
+    # 頭像、名牌與 ptt 框
+    shutil.copy('src/avatar_img/ava_bg.png', paths['AVATAR_IMG_DIR'])
+    Image.new('RGBA', (256, 256), (200, 80, 80, 255)).save(os.path.join(paths['AVATAR_IMG_DIR'], 'ava.png'))
+    Image.new('RGBA', (1000, 200), (60, 60, 180, 255)).save(os.path.join(paths['BANNER_IMG_DIR'], '1.png'))
+    for i in range(8):
+        Image.new('RGBA', (128, 128), (30 * i, 120, 120, 255)).save(os.path.join(paths['RATING_IMG_DIR'], f'rating_{i}.png'))
+
+    with open(stamp_path, 'w') as f:
+        f.write(stamp)
+    return paths, score_path
@@ -0,0 +1,44 @@
+import argparse
+
+from tools.score_history import ScoreHistory
+from tools.song_store import SongConstantStore
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query the score history recorded by online runs')
+    parser.add_argument('--db', default='src/score_history.sqlite')
+    parser.add_argument('--user', default='User001')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='import the saved score_<user>_YYYYMMDD.csv files of --user')
+    ingest_parser.add_argument('--score-dir', default='src')
+    ingest_parser.add_argument('--song-data', default='src/arcaea_song_level.sqlite')
+
+    subparsers.add_parser('ptt', help='potential over time')
+
+    chart_parser = subparsers.add_parser('chart', help='score history of one chart')
+    chart_parser.add_argument('title')
+    chart_parser.add_argument('difficulty', choices=['PST', 'PRS', 'FTR', 'BYD', 'ETR'])
+
+    improve_parser = subparsers.add_parser('improvements', help='charts improved between two snapshots')
+    improve_parser.add_argument('--since', help='YYYY-MM-DD (last snapshot of that day), defaults to the previous snapshot')
+    improve_parser.add_argument('--until', help='YYYY-MM-DD (last snapshot of that day), defaults to the latest snapshot')
+    args = parser.parse_args()
+
+    history = ScoreHistory(args.db)
+
+    if args.command == 'ingest':
+        added = history.ingest_dir(args.score_dir, SongConstantStore.load(args.song_data), args.user)
+        print(f'ingested {len(added)} snapshots')
+    elif args.command == 'ptt':
+        for snapshot, b30, r10, ptt in history.potential_history(args.user):
+            print(f'{snapshot}  ptt {ptt:.3f}  B30 {b30:.3f}  R10 {r10:.3f}')
+    elif args.command == 'chart':
+        for snapshot, score, potential in history.chart_history(args.title, args.difficulty, args.user):
+            print(f'{snapshot}  {score:,}  {potential:.4f}')
+    else:
+        for title, difficulty, old_score, new_score, old_ptt, new_ptt in history.improvements(args.user, args.since, args.until):
+            if old_score is None:
+                print(f'{title} [{difficulty}]  new {new_score:,}  ptt {new_ptt:.4f}')
+            else:
+                print(f'{title} [{difficulty}]  {old_score:,} -> {new_score:,}  ptt {old_ptt:.4f} -> {new_ptt:.4f}')
@@ -1,25 +1,27 @@
+import argparse
+import logging
 import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-import bs4
-import pandas as pd
-import requests
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from PIL import Image, ImageDraw
 
+from tools.assets import LayoutAssets
+from tools.cover_cache import COVER_MAX_SIZE, CoverTileCache, open_cover, save_cover
 from tools.draw_tools import draw_text_with_edge, draw_text_with_shadow
+from tools.encoder import OutputEncoder
+from tools.incremental import STATE_VERSION, changed_boxes, load_state, normalize_boxes, save_state
+from tools.instrument import RenderMetrics, log_event, peak_rss_mb, profiled, setup_logging
+from tools.layout import LayoutSpec
+from tools.parallel import render_box_tiles
+from tools.score_history import TIMESTAMP_FORMAT, ScoreHistory, score_csv_name
+from tools.score_table import build_score_table, count_best, parse_cards, read_scores
+from tools.scoring import add_play_ages, compute_potentials, get_avg_potential
+from tools.song_store import SongConstantStore
 from tools.utils import (
     adaptive_resize,
-    download_image,
-    download_images_multithreaded,
-    get_d_time,
-    get_potential,
     get_rating_img_path,
     textsize,
 )
@@ -34,85 +36,75 @@ class B30Render:
                  LAYOUT_IMG_DIR='src/layout_img',
                  RATING_IMG_DIR='src/rating_img',
                  BANNER_IMG_DIR='src/banner_img',
+                 AVATAR_IMG_DIR='src/avatar_img',
+                 SONG_DATA_PATH='src/arcaea_song_level.sqlite',
+                 assets=None,
+                 cover_cache=None,
+                 fetch_backend='selenium',
+                 web_client=None,
+                 fetch_timeouts=None,
+                 driver_pool=None,
+                 downloader=None,
+                 layout=None,
+                 encoder=None,
+                 score_history=None,
+                 profiler=None,
+                 profile_dump=None,
+                 cover_workers=8,
+                 batch_effects=False,
+                 jacket_url_template=None,
                  ):
 
         self.COVER_IMG_DIR = COVER_IMG_DIR
         self.RATING_IMG_DIR = RATING_IMG_DIR
         self.FONT_DIR = FONT_DIR    
         self.BANNER_IMG_DIR = BANNER_IMG_DIR
+        self.AVATAR_IMG_DIR = AVATAR_IMG_DIR
+        self.SONG_DATA_PATH = SONG_DATA_PATH
+        self.SONG_DATA_CSV_PATH = os.path.splitext(SONG_DATA_PATH)[0] + '.csv'
 
-        self.final_result = []
-        self.img_src_arr = []
-        self.img_download_queue = []
-        self.img_container = {}
-        self.username = 'User001'
+        # 共用素材 (批次渲染時由外部傳入同一份)
+        if assets is None:
+            assets = LayoutAssets(BG_IMG_DIR, FONT_DIR, DIFF_IMG_DIR, LAYOUT_IMG_DIR, AVATAR_IMG_DIR)
+        self.assets = assets
 
-        # 成績資訊欄位
-        self.columns = { 
-            2 : 'difficulty', 
-            4 : 'title',
-            6 : 'artist',
-            7 : 'grade',
-            8 : 'score',
-            11 : 'date',
-            13 : 'P',
-            15 : 'F',
-            17 : 'L',
-            }
-        
-        self.score_data = pd.DataFrame(columns=self.columns.values())
-        self.song_data = ''
+        self.song_data = None
 
         # bg 資訊初始化
-        self.box_width, self.box_height = 290, 170
-        self.start_x, self.start_y = 30, 30
-        self.padding = 30
         self.box_color = (100, 100, 100)
+        self.shadow_color = (0, 0, 0) 
+        self.default_layout = layout or LayoutSpec()
+        self.set_layout(self.default_layout)
 
-        self.img_width, self.img_height = 2150, self.padding * 7 + self.box_height * 6
-        self.image = Image.new('RGB', (self.img_width, self.img_height), color=(128, 128, 128))
-        self.draw = ImageDraw.Draw(self.image)
+        # 輸出格式
+        self.encoder = encoder or OutputEncoder()
 
-        # 字體初始化
-        self.font_path = f'{FONT_DIR}/Exo-SemiBold.ttf'  
-        self.font_dict = {
-            'title': ImageFont.truetype(self.font_path, 26),
-            'score': ImageFont.truetype(self.font_path, 30),
-            'text': ImageFont.truetype(self.font_path, 22),
-            'date': ImageFont.truetype(self.font_path, 24),
-            'ptt_dec': ImageFont.truetype(self.font_path, 40),
-            'ptt_fixed': ImageFont.truetype(self.font_path, 30),
-            'p_name': ImageFont.truetype(self.font_path, 50),
-        }
+        # 線上取得的成績快照
+        self.score_history = score_history or ScoreHistory()
 
-        # 難度tag初始化
-        self.diff_tag_img_dict = {
-            'PST': Image.open(f'{DIFF_IMG_DIR}/PST.png'),
-            'PRS': Image.open(f'{DIFF_IMG_DIR}/PRS.png'),
-            'FTR': Image.open(f'{DIFF_IMG_DIR}/FTR.png'),
-            'BYD': Image.open(f'{DIFF_IMG_DIR}/BYD.png'),
-            'ETR': Image.open(f'{DIFF_IMG_DIR}/ETR.png'),
-        }
-        
-        self.shadow_color = (0, 0, 0) 
-        self.shadow_margin = 17
-        self.shadow_blur_radius = 5
-        self.shadow_layer = Image.new('RGBA', (self.box_width + self.shadow_margin * 2, 
-                                               self.box_height + self.shadow_margin * 2,), 
-                                               (0, 0, 0, 1))
+        # 各階段耗時與計數，profiler 為 None、'cprofile' 或 'tracemalloc'
+        self.metrics = RenderMetrics()
+        self.profiler = profiler
+        self.profile_dump = profile_dump
 
-        self.shadow_draw = ImageDraw.Draw(self.shadow_layer)
+        # 圖片下載 (連線池、重試與磁碟快取)，線上模式第一次使用時才建立
+        self._downloader = downloader
 
-        self.bg_img = Image.open(f'{BG_IMG_DIR}/{random.choice(os.listdir(BG_IMG_DIR))}')
-        self.bg_mask = Image.open(f'{LAYOUT_IMG_DIR}/bg_mask.png')
+        # 管線模式讀取、下載與處理封面的 thread 數量
+        self.cover_workers = cover_workers
+        self._cover_executor = None
 
-        self.side_img = Image.open(f'{LAYOUT_IMG_DIR}/side2.png')
- 
-        self.side_img_shadow = Image.open(f'{LAYOUT_IMG_DIR}/side_shadow.png')
-        
-        
-        self.chrome_options = Options()
+        # 封面 tile 快取，batch_effects 為 True 時以 numpy 一次處理所有未快取封面的模糊與調暗
+        if cover_cache is None:
+            cover_cache = CoverTileCache(f'{COVER_IMG_DIR}/.tiles', batch_effects=batch_effects)
+        self.cover_cache = cover_cache
+
+        self.credentials = None
+        self.reset()
+
+        self._chrome_options = None
         self.user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
+        self.chrome_args = []
         chrome_args = [
             "--headless",
             "--disable-gpu",
@@ -124,18 +116,117 @@ class B30Render:
         ]
             
         self.add_chrome_args(chrome_args)
+
+        # 線上成績取得方式: 'selenium' 或 'http'
+        self.fetch_backend = fetch_backend
+
+        # 瀏覽器等待頁面元素的逾時秒數
+        self.fetch_timeouts = {'page': 15, 'login': 20}
+        self.fetch_timeouts.update(fetch_timeouts or {})
+        self.fetch_timings = {}
+        # 多帳號時由外部傳入共用的 DriverPool
+        self.driver_pool = driver_pool
+        self._web_client = web_client
+        # http 模式的封面網址格式，例如 https://example.com/{song_id}.jpg，欄位為 API 成績資料的鍵
+        self.jacket_url_template = jacket_url_template
         # cookie_str = ''
         # cookies = parse_cookies(cookie_str, domain='.lowiro.com')
 
-        # 生成日期
-        
-        self.gen_date = datetime.now().strftime("%Y/%m/%d")
+    # selenium 與 requests 只在線上模式使用，第一次存取時才 import，離線渲染不需載入
+    @property
+    def chrome_options(self):
+        if self._chrome_options is None:
+            from selenium.webdriver.chrome.options import Options
+
+            self._chrome_options = Options()
+            for arg in self.chrome_args:
+                self._chrome_options.add_argument(arg)
+        return self._chrome_options
+
+    @property
+    def web_client(self):
+        if self._web_client is None:
+            from tools.web_client import ArcaeaWebClient
+
+            self._web_client = ArcaeaWebClient(user_agent=self.user_agent, jacket_url_template=self.jacket_url_template)
+        return self._web_client
+
+    @property
+    def downloader(self):
+        if self._downloader is None:
+            from tools.downloader import ImageDownloader
+
+            self._downloader = ImageDownloader()
+        return self._downloader
+
+    @property
+    def cover_executor(self):
+        if self._cover_executor is None:
+            self._cover_executor = ThreadPoolExecutor(max_workers=self.cover_workers)
+        return self._cover_executor
+
+    @property
+    def font_dict(self):
+        return self.assets.get_fonts(self.layout.scale)
+
+    @property
+    def diff_tag_img_dict(self):
+        return self.assets.get_diff_tags(self.layout.scale)
     
     def add_chrome_args(self, args):
-        for arg in args:
-            self.chrome_options.add_argument(arg)
+        self.chrome_args.extend(args)
+        if self._chrome_options is not None:
+            for arg in args:
+                self._chrome_options.add_argument(arg)
+
+    def set_layout(self, layout):
+        """
+        依版面設定計算畫布、歌曲框與陰影尺寸，並選用對應縮放的字體與素材
+        """
+        self.layout = layout
+        s = layout.s
+
+        self.box_width, self.box_height = layout.box_width, layout.box_height
+        self.start_x, self.start_y = layout.padding, layout.padding
+        self.padding = layout.padding
+        self.img_width, self.img_height = layout.img_width, layout.img_height
+
+        self.shadow_margin = s(17)
+        self.shadow_blur_radius = 5 * layout.scale
+
+        self.cover_tile_params = {
+            'box_size': (self.box_width, self.box_height),
+            'crop_top': s(10),
+            'blur_radius': 3 * layout.scale,
+        }
+
+    def reset(self, bg_name=None):
+        """
+        重置單張卡片的渲染狀態，共用素材不受影響
+        """
+        self.final_result = []
+        self.img_src_arr = []
+        self.img_download_queue = []
+        self.img_container = {}
+        self.cover_tiles = {}
+        self.cover_futures = {}
+        self.render_state = None
+        self.changed_boxes = None
+        self.username = 'User001'
+        self.score_data = build_score_table([])
+
+        self.bg_name = bg_name or random.choice(self.assets.bg_names)
+        # 畫布由 draw_background 自底圖複製
+        self.image = None
+        self.draw = None
+
+        # 生成日期
+        self.gen_date = datetime.now().strftime("%Y/%m/%d")
 
     def get_userkey(self):
+        if self.credentials:
+            return self.credentials
+
         with open('user.txt', 'r') as f:
             data = f.readlines()
             username_input = data[0].strip()
@@ -143,154 +234,155 @@ class B30Render:
 
         return username_input, password_input
     
-    def load_song_data(self, score_titles):
-        if not os.path.exists('src/arcaea_song_level.csv'):
-            print('Creating song data...')
-            self.get_song_data()
-        
-        data = pd.read_csv('src/arcaea_song_level.csv')
+    def load_song_data(self, score_titles, refresh=True):
+        """
+        :param refresh: 缺少歌曲時由 wiki 更新定數表，False 時直接以 ValueError 回報缺少的歌曲
+        """
+        if os.path.exists(self.SONG_DATA_PATH):
+            data = SongConstantStore.load(self.SONG_DATA_PATH)
+        elif os.path.exists(self.SONG_DATA_CSV_PATH):
+            # 由舊版 csv 轉換
+            data = SongConstantStore.from_csv(self.SONG_DATA_CSV_PATH, self.SONG_DATA_PATH)
+        else:
+            if not refresh:
+                raise ValueError(f'song constants not found: {self.SONG_DATA_PATH}')
+            log_event('song_data_create', path=self.SONG_DATA_PATH)
+            return self.get_song_data()
+
         if not self.check_all_song_exist(data, score_titles):
-            print('Updating song data...')
-            self.get_song_data()
-            return pd.read_csv('src/arcaea_song_level.csv')
+            if not refresh:
+                raise ValueError(f'unknown songs: {sorted(data.missing(score_titles))}')
+            log_event('song_data_update', missing=len(data.missing(score_titles)))
+            return self.get_song_data(data)
 
         return data
     
     def check_all_song_exist(self, song_data, score_titles):
-        for title in score_titles:
-            if title not in song_data['title'].values:
-                return False
-        return True
+        return not song_data.missing(score_titles)
     
-    def get_song_data(self):
-        # 爬取定數表
-        headers = {'User-Agent': self.user_agent}
-
-        def fetch_page(url):
-            try:
-                response = requests.get(url, headers=headers)
-                response.raise_for_status()  
-                return response
-            except requests.exceptions.RequestException as e:
-                return f"Error: {e}"
-
-        page_content = fetch_page('https://arcwiki.mcd.blue/%E5%AE%9A%E6%95%B0%E8%AF%A6%E8%A1%A8')
-
-        soup = bs4.BeautifulSoup(page_content.text, 'html.parser')
-        tbody = soup.find('tbody')
-        songs_info = tbody.find_all('tr')
-
-        songs_info_df = pd.DataFrame(columns=['title', 'PST', 'PRS', 'FTR', 'BYD', 'ETR'])
-
-        for idx, song_info in enumerate(songs_info[1:]):
-            song_info = song_info.text.split('\n')[1:7]
-        
-            songs_info_df.loc[idx] = song_info
-            
-        
-        songs_info_df.to_csv('src/arcaea_song_level.csv', index=False)
-
-    def get_ptt_page_online(self):
-
-        final_result = []
-
-        try:
-            driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=self.chrome_options)
-
-            driver.get("https://arcaea.lowiro.com/zh/profile/potential")
-            time.sleep(2)
-
-            # for cookie in cookies:
-            #     driver.add_cookie(cookie)
-
-            username_input, password_input = self.get_userkey()
-                
-            username = driver.find_element(By.CSS_SELECTOR, "input[name='user']")
-            password = driver.find_element(By.CSS_SELECTOR, "input[name='password']")
+    def get_song_data(self, store=None):
+        # 增量更新定數表，只合併新增或變更的歌曲
+        from tools.song_wiki import update_song_data
+
+        store = store or SongConstantStore(self.SONG_DATA_PATH)
+        with self.metrics.stage('song_data_update'):
+            result = update_song_data(store, headers={'User-Agent': self.user_agent})
+        log_event('song_data_updated', status=result['status'], added=result['added'], changed=result['changed'])
+        return store
+
+    def get_ptt_page_online(self, profile=None, persist=True):
+        """
+        :param profile: 已預先抓取的個人資料 (例如批次模式的 fetch_many 結果)，None 時即時抓取
+        :param persist: False 時只渲染 (渲染服務): 不寫入成績 csv 與成績紀錄，也不連線更新定數表
+        """
+        if profile is None:
+            with self.metrics.stage('fetch'):
+                profile = self.fetch_profile()
+        if profile is None:
+            return 'err'
+
+        with self.metrics.stage('apply_profile'):
+            self.apply_profile(profile)
 
-            username.send_keys(username_input)
-            password.send_keys(password_input)
+        # 儲存成績資料
+        if persist:
+            with self.metrics.stage('save_scores'):
+                score_path = f"src/{score_csv_name(self.username, self.gen_date.replace('/', ''))}"
+                self.score_data.to_csv(score_path, index=False)
+        with self.metrics.stage('song_data'):
+            self.song_data = self.load_song_data(self.score_data['title'].values, refresh=persist)
+        with self.metrics.stage('potentials'):
+            self.score_data = compute_potentials(self.score_data, self.song_data)
+        if persist:
+            with self.metrics.stage('score_history'):
+                self.score_history.add_snapshot(self.score_data, datetime.now().strftime(TIMESTAMP_FORMAT), self.username)
 
-            driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
+        return 0
 
-            # driver.refresh()
+    def fetch_profile(self):
+        """
+        依 fetch_backend 取得成績與個人資料，失敗時回傳 None
+        """
+        import requests
 
-            time.sleep(3)
+        from tools.web_client import LoginError
 
-            if '登入失败' in driver.page_source:
-                print('login failed, please check your username and password again')
-                return 'err'
-            
+        username_input, password_input = self.get_userkey()
 
-            # 獲取頁面資訊
-            results = driver.find_elements(By.CSS_SELECTOR, "div[data-v-337fbd7d].card-list div[data-v-337fbd7d].card")
-            for result in results:
-                final_result.append(result.text)
+        if self.fetch_backend == 'http':
+            try:
+                return self.web_client.fetch(username_input, password_input)
+            except LoginError:
+                log_event('login_failed', logging.WARNING, backend='http')
+                return None
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                # http 取得失敗時改用瀏覽器
+                log_event('fetch_fallback', logging.WARNING, backend='http', error=str(e))
 
-            img_results = driver.find_elements(By.CSS_SELECTOR, "div[data-v-337fbd7d].card-list div[data-v-337fbd7d].card div[data-v-3d1a04fb].section-2 img")
-            self.username = driver.find_element(By.CSS_SELECTOR, "span[class='username']").text
+        from tools.browser_pool import DriverPool, scrape_profile
 
-            avatar_url = driver.find_element(By.CSS_SELECTOR, "div[data-v-f7bc1a70].profile-image").get_attribute('style').split('\"')[1]
-            rating_bg_url = driver.find_element(By.CSS_SELECTOR, "div[data-v-f7bc1a70].profile-image div[data-v-f7bc1a70]").get_attribute('style').split('\"')[1]
-            download_image(avatar_url, self.img_container, 'avatar')
-            download_image(rating_bg_url, self.img_container, 'rating_bg')
+        # 未指定 driver pool 時只使用一次瀏覽器
+        pool = self.driver_pool or DriverPool(self.chrome_options)
 
-            self.img_src_arr = [img.get_attribute('src') for img in img_results]
+        try:
+            with pool.acquire() as driver:
+                profile = scrape_profile(driver, username_input, password_input, self.fetch_timeouts)
+            self.fetch_timings = profile['timings']
+            for name, seconds in self.fetch_timings.items():
+                self.metrics.add_time(f'fetch.{name}', seconds)
+            return profile
+
+        except LoginError:
+            log_event('login_failed', logging.WARNING, backend='selenium')
+        except Exception as e:
+            log_event('fetch_failed', logging.ERROR, backend='selenium', error=str(e))
 
-            # 下載名牌背景
+        finally:
+            if pool is not self.driver_pool:
+                pool.close()
 
-            driver.get("https://arcaea.lowiro.com/zh/profile/")
-            time.sleep(2)
-            banner_url = driver.find_element(By.CSS_SELECTOR, "img[class='profile-banner__banner']").get_attribute('src')
+        return None
 
-            download_image(banner_url, self.img_container, 'banner')
+    def apply_profile(self, profile):
+        self.username = profile['username']
+        self.img_src_arr = profile['img_src_arr']
 
-        except Exception as e:
-            print(f'Error: {e}')
-            return 0
-        
-        finally:
-            # 關閉瀏覽器
-            driver.quit()
-            print('browser closed')
-
-        for idx, result in enumerate(final_result):
-            result = result.split('\n')
-            row_data = {value: result[key] for key, value in self.columns.items()}
-            self.score_data.loc[idx] = row_data
-        
-        # 儲存成績資料
-        self.score_data.to_csv(f"src/score_{self.gen_date.replace('/', '')}.csv", index=False)
-        self.song_data = self.load_song_data(self.score_data['title'].values)
+        # 網頁卡片文字或 API 的資料列一次轉為成績表，已建立的成績表 (score_data) 直接使用
+        if 'score_data' in profile:
+            self.score_data = profile['score_data']
+        else:
+            self.score_data = build_score_table(parse_cards(profile['cards']) if 'cards' in profile else profile['rows'])
 
-        return 0
+        self.downloader.download([[key, profile[f'{key}_url'], None] for key in ['avatar', 'rating_bg', 'banner']
+                                  if profile.get(f'{key}_url')], self.img_container)
 
     def get_ptt_page_offline(self, file_path):
-        self.score_data = pd.read_csv(file_path)
+        with self.metrics.stage('read_scores'):
+            self.score_data = read_scores(file_path)
 
-        self.song_data = self.load_song_data(self.score_data['title'].values)
+        with self.metrics.stage('song_data'):
+            self.song_data = self.load_song_data(self.score_data['title'].values)
+        with self.metrics.stage('potentials'):
+            self.score_data = compute_potentials(self.score_data, self.song_data)
     
-    def get_avg_ptt(self, type='B30'):
-        
-        if type == 'B30':
-            data = self.score_data[:30]
-            n = 30
-        elif type == 'R10':
-            data = self.score_data[-10:]
-            n = 10
-        else:
-            raise ValueError('type must be B30 or R10')
-        
-        single_ptt = 0
-        for _, row in data.iterrows():
-            song_lv = self.song_data[self.song_data['title'] == row['title']][row['difficulty']].values[0]
-            single_ptt = single_ptt + get_potential(row['score'], song_lv)
+    def get_box_scores(self):
+        """
+        版面上繪製的成績，只取最佳成績，R10 不會畫成 #31 之後的歌曲框
+        """
+        return self.score_data[:min(self.layout.n_boxes, count_best(self.score_data))]
 
-        return round(single_ptt / n, 3)
+    def get_avg_ptt(self, type='B30'):
+        return get_avg_potential(self.score_data, type)
     
-    def get_cover_img(self):
+    def get_cover_img(self, indices=None):
+        """
+        :param indices: 只處理這些 info box 的封面 (增量繪製)，None 時處理全部
+        """
         cnt = 0
-        for idx, title in enumerate(self.score_data['title']):
+        # 只處理會畫出的 info box，R10 中未進入版面的歌曲不需要封面
+        for idx, title in enumerate(self.get_box_scores()['title']):
+            if indices is not None and idx not in indices:
+                continue
             
             if not os.path.exists(f'{self.COVER_IMG_DIR}/{title}.jpg'):
                 # 如果封面圖未下載過，加入下載佇列並讀取
@@ -300,12 +392,117 @@ class B30Render:
                 cnt += 1
                 self.img_download_queue.append([idx, self.img_src_arr[idx], f"{self.COVER_IMG_DIR}/{title}.jpg"])
             else:
-                # 直接讀取封面圖
-                cover_img = Image.open(f'{self.COVER_IMG_DIR}/{title}.jpg')        
-                self.img_container[idx] = cover_img
-
-        download_images_multithreaded(self.img_download_queue, self.img_container)
-        print(f'downloaded {cnt} cover images')
+                # 直接讀取封面圖，tile 快取命中時不會解碼
+                self.img_container[idx] = open_cover(f'{self.COVER_IMG_DIR}/{title}.jpg', self.box_width + 1)
+
+        self.metrics.count('covers_queued', cnt)
+        # 沒有封面網址 (例如 http 模式未設定 jacket_url_template) 視為下載失敗
+        for idx, url, _ in self.img_download_queue:
+            if not url:
+                self.metrics.count('download_failures')
+                log_event('cover_url_missing', logging.WARNING, title=self.score_data['title'][idx])
+        # 下載的封面縮小後才存檔，不保留原始尺寸
+        jobs = [[idx, url, None] for idx, url, _ in self.img_download_queue if url]
+        if jobs:
+            result = self.downloader.download(jobs, self.img_container, COVER_MAX_SIZE)
+            save_paths = {idx: save_path for idx, _, save_path in self.img_download_queue}
+            for idx in result.downloaded:
+                self.img_container[idx] = save_cover(self.img_container[idx], save_paths[idx])
+            self.metrics.count('covers_downloaded', len(result.downloaded) - result.cache_hits)
+            self.metrics.count('download_cache_hits', result.cache_hits)
+            self.metrics.count('bytes_downloaded', result.bytes_downloaded)
+            self.metrics.count('download_failures', len(result.failed))
+            for idx, error in result.failed.items():
+                log_event('cover_download_failed', logging.WARNING, title=self.score_data['title'][idx], error=error)
+
+        # 處理 info box 底圖，快取命中時不需解碼原圖，未命中的封面一次交給 put_many 處理
+        misses = []
+        for idx, title in enumerate(self.get_box_scores()['title']):
+            if indices is not None and idx not in indices:
+                continue
+            if idx not in self.img_container:
+                # 封面下載失敗，info box 只畫底色
+                continue
+            cover_path = f'{self.COVER_IMG_DIR}/{title}.jpg'
+            tile = self.cover_cache.get(title, cover_path, **self.cover_tile_params)
+            # 封面處理為 tile 後即釋放
+            cover_img = self.img_container.pop(idx)
+            if tile is None:
+                misses.append((idx, (title, cover_path, cover_img)))
+            else:
+                self.metrics.count('cover_tile_hits')
+                self.cover_tiles[idx] = tile
+
+        if misses:
+            tiles = self.cover_cache.put_many([cover for _, cover in misses], **self.cover_tile_params)
+            self.cover_tiles.update(zip([idx for idx, _ in misses], tiles))
+            self.metrics.count('cover_tiles_built', len(misses))
+
+    def submit_cover_tiles(self):
+        """
+        管線模式: 每個 info box 的封面讀取 (或下載) 與 tile 處理交給 thread 執行，不等待完成
+        """
+        for idx, title in enumerate(self.get_box_scores()['title']):
+            cover_path = f'{self.COVER_IMG_DIR}/{title}.jpg'
+            url = None
+            if not os.path.exists(cover_path):
+                if not self.img_src_arr:
+                    raise ValueError('must use online mode to get img source')
+                self.metrics.count('covers_queued')
+                url = self.img_src_arr[idx]
+                if not url:
+                    self.metrics.count('download_failures')
+                    log_event('cover_url_missing', logging.WARNING, title=title)
+                    continue
+            self.cover_futures[idx] = self.cover_executor.submit(self._load_cover_tile, title, cover_path, url)
+
+    def _load_cover_tile(self, title, cover_path, url=None):
+        """
+        在 thread 中執行，計數於 wait_cover_tile 再合併到 self.metrics
+        :return: (tile, 計數)
+        """
+        counters = {}
+        cover_img = None
+        if url is not None:
+            cover_img, from_cache, size = self.downloader.fetch_image(url, draft_size=COVER_MAX_SIZE)
+            cover_img = save_cover(cover_img, cover_path)
+            if from_cache:
+                counters['download_cache_hits'] = 1
+            else:
+                counters['covers_downloaded'] = 1
+                counters['bytes_downloaded'] = size
+
+        tile = self.cover_cache.get(title, cover_path, **self.cover_tile_params)
+        if tile is None:
+            if cover_img is None:
+                cover_img = open_cover(cover_path, self.box_width + 1)
+            tile = self.cover_cache.put(title, cover_path, cover_img, **self.cover_tile_params)
+            counters['cover_tiles_built'] = 1
+        else:
+            counters['cover_tile_hits'] = 1
+        return tile, counters
+
+    def wait_cover_tile(self, idx):
+        """
+        取得 info box 的封面 tile，管線模式下等待該格的封面完成，失敗時改用佔位 tile
+        """
+        future = self.cover_futures.pop(idx, None)
+        if future is not None:
+            start = time.perf_counter()
+            try:
+                tile, counters = future.result()
+            except Exception as e:
+                tile, counters = self.get_placeholder_tile(), {'cover_failures': 1}
+                log_event('cover_load_failed', logging.WARNING, title=self.score_data['title'][idx], error=str(e))
+            self.metrics.add_time('cover_wait', time.perf_counter() - start)
+            for name, n in counters.items():
+                self.metrics.count(name, n)
+            self.cover_tiles[idx] = tile
+        return self.cover_tiles.get(idx)
+
+    def get_placeholder_tile(self):
+        # 與歌曲框底色相同，封面失敗的 info box 與序列繪製時一致
+        return Image.new('RGB', (self.box_width + 1, self.box_height + 1), self.box_color)
 
     def draw_banner(
                 self,
@@ -315,15 +512,18 @@ class B30Render:
                 ) -> None:
  
         # ptt = 0
+        s = self.layout.s
+        edge_width = max(s(2), 1)
+
         # 繪製名牌背景
         if 'banner' in self.img_container.keys():
             banner_bg = self.img_container['banner']
         else:
             banner_bg = Image.open(os.path.join(f'{self.BANNER_IMG_DIR}', '1.png'))
 
-        banner_bg = adaptive_resize(banner_bg, (700, '*'))
+        banner_bg = adaptive_resize(banner_bg, (s(700), '*'))
 
-        banner_bg = banner_bg.crop((0, 0, banner_bg.width - 270, banner_bg.height))
+        banner_bg = banner_bg.crop((0, 0, banner_bg.width - s(270), banner_bg.height))
         self.image.paste(banner_bg, (self.img_width - banner_bg.width, coord[1]), banner_bg)
         
         # 繪製玩家頭像
@@ -331,14 +531,13 @@ class B30Render:
         if 'avatar' in self.img_container.keys():
             avatar_img = self.img_container['avatar']
         else:
-            avatar_img = Image.open(os.path.join('src/avatar_img', 'ava.png'))
+            avatar_img = Image.open(os.path.join(self.AVATAR_IMG_DIR, 'ava.png'))
         
-        avatar_bg = Image.open(os.path.join('src/avatar_img', 'ava_bg.png'))
-        avatar_img = avatar_img.resize((180, 180))
-        avatar_bg = avatar_bg.resize((216, 216))
+        avatar_bg = self.assets.get_avatar_bg(self.layout.scale)
+        avatar_img = avatar_img.resize((s(180), s(180)))
         dx, dy = (avatar_bg.width - avatar_img.width) // 2, (avatar_bg.height - avatar_img.height) // 2
-        self.image.paste(avatar_bg, (coord[0] - 80 - dx + 1, coord[1] - 80 - dy + 1), avatar_bg)
-        self.image.paste(avatar_img, (coord[0] - 80, coord[1] - 80), avatar_img)
+        self.image.paste(avatar_bg, (coord[0] - s(80) - dx + 1, coord[1] - s(80) - dy + 1), avatar_bg)
+        self.image.paste(avatar_img, (coord[0] - s(80), coord[1] - s(80)), avatar_img)
 
 
         # 繪製ptt背景框
@@ -347,7 +546,7 @@ class B30Render:
         else:
             ptt_box_img = Image.open(os.path.join(f'{self.RATING_IMG_DIR}', get_rating_img_path(ptt)))
         
-        ptt_box_img = ptt_box_img.resize((110, 110))
+        ptt_box_img = ptt_box_img.resize((s(110), s(110)))
         
 
         self.image.paste(ptt_box_img, coord, ptt_box_img)
@@ -358,154 +557,325 @@ class B30Render:
         ptt_dec_part = str(int(ptt)) + '.'
         ptt_fixed_part = str(int((ptt - int(ptt)) * 100))
 
-        draw_text_with_edge(self.draw, (coord[0] + 12, coord[1] + 65), f'{ptt_dec_part}', self.font_dict['ptt_dec'], (255, 255, 255), (60, 50, 66), side='bottom', ew=2)
-        draw_text_with_edge(self.draw, (coord[0] + 12 + textsize(ptt_dec_part, self.font_dict['ptt_dec'])[0] - 1, coord[1] + 65), ptt_fixed_part, self.font_dict['ptt_fixed'], (255, 255, 255), (60, 50, 66), side='bottom', ew=2)
+        draw_text_with_edge(self.draw, (coord[0] + s(12), coord[1] + s(65)), f'{ptt_dec_part}', self.font_dict['ptt_dec'], (255, 255, 255), (60, 50, 66), side='bottom', ew=edge_width, image=self.image)
+        draw_text_with_edge(self.draw, (coord[0] + s(12) + textsize(ptt_dec_part, self.font_dict['ptt_dec'])[0] - 1, coord[1] + s(65)), ptt_fixed_part, self.font_dict['ptt_fixed'], (255, 255, 255), (60, 50, 66), side='bottom', ew=edge_width, image=self.image)
 
         # 繪製玩家名稱
-        draw_text_with_edge(self.draw, (coord[0] + 110, coord[1] + 60), name, self.font_dict['p_name'], (255, 255, 255), (60, 50, 66), side='bottom')
-        draw_text_with_shadow(self.draw, (coord[0] + 110, coord[1] + 60), name, self.font_dict['p_name'], (255, 255, 255), side='bottom')
+        draw_text_with_edge(self.draw, (coord[0] + s(110), coord[1] + s(60)), name, self.font_dict['p_name'], (255, 255, 255), (60, 50, 66), side='bottom', image=self.image)
+        draw_text_with_shadow(self.draw, (coord[0] + s(110), coord[1] + s(60)), name, self.font_dict['p_name'], (255, 255, 255), side='bottom')
 
 
-    def draw_background(self, r10_avg_ptt, b30_avg_ptt):
-        self.shadow_draw.rectangle([self.shadow_margin, 
-                                    self.shadow_margin, 
-                                    self.box_width + self.shadow_margin, 
-                                    self.box_height + self.shadow_margin], 
-                                    fill=self.shadow_color)
+    def build_template(self, n_boxes):
+        """
+        繪製固定不變的底圖: 背景、側邊圖、歌曲框陰影與底色
+        """
+        image = Image.new('RGB', (self.img_width, self.img_height), color=(128, 128, 128))
+        draw = ImageDraw.Draw(image)
 
-        # 应用模糊滤镜
-        self.shadow_layer = self.shadow_layer.filter(ImageFilter.GaussianBlur(radius=self.shadow_blur_radius))
-    
         # 將背景圖片裁切至畫布大小後貼上
-        if self.img_width > self.bg_img.width or self.img_height > self.bg_img.height:
-            max_length = max(self.img_width, self.img_height)
-            if max_length > self.bg_img.width:
-                self.bg_img = adaptive_resize(self.bg_img, (max_length, '*'))
-            else:
-                self.bg_img = adaptive_resize(self.bg_img, ('*', max_length))
-    
-        self.bg_img = self.bg_img.crop((self.bg_img.width // 2 - self.img_width // 2, self.bg_img.height // 2 - self.img_height // 2, self.bg_img.width // 2 + self.img_width // 2, self.bg_img.height // 2 + self.img_height // 2))
-        self.image.paste(self.bg_img, (0, 0))
-        self.image.paste(self.bg_mask, (0, 0), self.bg_mask)
+        bg_img = self.assets.get_background(self.bg_name, (self.img_width, self.img_height))
+        image.paste(bg_img, (0, 0))
+        bg_mask = self.assets.get_bg_mask(self.img_height, self.layout.scale)
+        image.paste(bg_mask, (0, 0), bg_mask)
 
         # 加上側邊背景
+        s = self.layout.s
+        side_img, side_img_shadow = self.assets.get_side_images(self.img_height, self.layout.scale)
         
-        self.side_img_shadow = adaptive_resize(self.side_img_shadow, ('*', self.img_height + 140))
-        self.side_img = adaptive_resize(self.side_img, ('*', self.img_height + 120))
-        
-        self.image.paste(self.side_img_shadow, (self.img_width - self.side_img_shadow.width + 2, -5), self.side_img_shadow)
-        self.image.paste(self.side_img, (self.img_width - self.side_img.width, -5), self.side_img)
-        
+        image.paste(side_img_shadow, (self.img_width - side_img_shadow.width + s(2), -s(5)), side_img_shadow)
+        image.paste(side_img, (self.img_width - side_img.width, -s(5)), side_img)
 
-        
-        draw_text_with_edge(self.draw, (self.img_width - 20, 20), f'{self.gen_date}', self.font_dict['score'], (255, 255, 255), side='right')
+        # 陰影打底，先於所有 info box 繪製，溢出的文字才不會被下一格的陰影蓋住
+        shadow_layer = self.assets.get_box_shadow((self.box_width, self.box_height), self.shadow_margin,
+                                                  self.shadow_blur_radius, self.shadow_color)
+        for idx in range(n_boxes):
+            x, y = self.get_box_coord(idx)
+            image.paste(shadow_layer, (x - self.shadow_margin, y - self.shadow_margin), shadow_layer)
 
-        draw_text_with_edge(self.draw, (self.img_width - 20, 280), f'Recent Top 10 AVG: {r10_avg_ptt:.3f}', self.font_dict['score'], (255, 255, 255), side='right')
-        draw_text_with_edge(self.draw, (self.img_width - 20, 320), f'Best 30 AVG: {b30_avg_ptt:.3f}', self.font_dict['score'], (255, 255, 255), side='right')
-        
-        # 加入角色立繪
-        # char_img = Image.open('src/char_img/2.png')
-        # char_img = adaptive_resize(char_img, (1000, '*'))
-        # char_c_coord = (self.img_width - 200, self.img_height - 350)
-        # self.image.paste(char_img, (char_c_coord[0] - char_img.width // 2, char_c_coord[1] - char_img.height // 2), char_img)
+        for idx in range(n_boxes):
+            x, y = self.get_box_coord(idx)
+            draw.rectangle([x, y, x + self.box_width, y + self.box_height], fill=self.box_color)
 
-    def draw_info_box(self, idx, row, coord):
-       
-        x, y = coord
-        
-        # 圖片文字資訊
-        title = row['title'][:18] + '...' if len(row['title']) > 20 else row['title']
-        score = row['score']
-        song_lv = self.song_data[self.song_data['title'] == row['title']][row['difficulty']].values[0]
+        return image
 
-        
-        ptt = str(get_potential(score, song_lv)).ljust(6, '0')
-        
-        grade = row['grade']
-    
-        date = get_d_time(row['date'])
+    def get_template(self, n_boxes):
+        template_key = (self.bg_name, self.layout.key(), self.box_color, self.shadow_color, n_boxes)
+        return self.assets.get_template(template_key, lambda: self.build_template(n_boxes))
 
+    def draw_background(self, r10_avg_ptt, b30_avg_ptt, n_boxes=30):
+        # 由快取的底圖開始繪製
+        self.image = self.get_template(n_boxes).copy()
+        self.draw = ImageDraw.Draw(self.image)
+        self.draw_header_text(r10_avg_ptt, b30_avg_ptt)
 
-        P_amount = row['P']
-        F_amount = row['F']
-        L_amount = row['L']
+    def draw_header_text(self, r10_avg_ptt, b30_avg_ptt):
+        s = self.layout.s
         
+        draw_text_with_edge(self.draw, (self.img_width - s(20), s(20)), f'{self.gen_date}', self.font_dict['score'], (255, 255, 255), side='right', image=self.image)
 
+        draw_text_with_edge(self.draw, (self.img_width - s(20), s(280)), f'Recent Top 10 AVG: {r10_avg_ptt:.3f}', self.font_dict['score'], (255, 255, 255), side='right', image=self.image)
+        draw_text_with_edge(self.draw, (self.img_width - s(20), s(320)), f'Best 30 AVG: {b30_avg_ptt:.3f}', self.font_dict['score'], (255, 255, 255), side='right', image=self.image)
         
-        # 裁切封面圖至歌曲框大小
-        song_img = self.img_container[idx]
-
-        song_img = song_img.resize((self.box_width + 1, self.box_width + 1))
-        song_img = song_img.crop((0, 10, self.box_width + 1, 10 + self.box_height + 1))
+        # 加入角色立繪
+        # char_img = Image.open('src/char_img/2.png')
+        # char_img = adaptive_resize(char_img, (1000, '*'))
+        # char_c_coord = (self.img_width - 200, self.img_height - 350)
+        # self.image.paste(char_img, (char_c_coord[0] - char_img.width // 2, char_c_coord[1] - char_img.height // 2), char_img)
 
-        # 高斯模糊
-        song_img = song_img.filter(ImageFilter.BoxBlur(3))
+    def get_box_info(self, idx, row):
+        """
+        整理 info box 需要的文字資訊，繪製時不再查表
+        """
+        return {
+            'title': row['title'][:18] + '...' if len(row['title']) > 20 else row['title'],
+            'difficulty': row['difficulty'],
+            'score': f"{row['score']:,}",
+            'song_lv': row['song_lv'],
+            'ptt': str(row['potential']).ljust(6, '0'),
+            'grade': row['grade'],
+            'date': row['age'],
+            'P': row['P'],
+            'F': row['F'],
+            'L': row['L'],
+            'rank': idx + 1,
+        }
 
-        # 調暗圖片
-        song_img = song_img.point(lambda p: p * 0.5)
+    def get_box_coord(self, idx):
+        return self.layout.get_box_coord(idx)
 
+    def draw_info_box(self, idx, info, coord):
+       
+        x, y = coord
         
-
-        # 陰影打底
-    
-        self.image.paste(self.shadow_layer, (x - self.shadow_margin, y - self.shadow_margin), self.shadow_layer)
-
-        self.draw.rectangle([x, y, x + self.box_width, y + self.box_height], fill=self.box_color)
-
-        self.image.paste(song_img, (x, y))
+        # 已裁切、模糊並調暗的封面圖，貼上後即釋放
+        cover_tile = self.cover_tiles.pop(idx, None)
+        if cover_tile is not None:
+            self.image.paste(cover_tile, (x, y))
 
         # 加上難度標籤
-        diff_tag = self.diff_tag_img_dict[row['difficulty']]
+        diff_tag = self.diff_tag_img_dict[info['difficulty']]
         self.image.paste(diff_tag, (x + self.box_width - diff_tag.width + 1, y), diff_tag)
         
         # 繪製info box文字
+        s = self.layout.s
     
-        draw_text_with_edge(self.draw, (x + 10, y + 10), title, self.font_dict['title'], (255, 255, 255))
+        draw_text_with_edge(self.draw, (x + s(10), y + s(10)), info['title'], self.font_dict['title'], (255, 255, 255), image=self.image)
 
-        draw_text_with_edge(self.draw, (x + 10, y + 39), score, self.font_dict['score'], (255, 255, 255))
-        draw_text_with_edge(self.draw, (x + 180, y + 42), f'[{grade}]', self.font_dict['title'], (255, 255, 255))
+        draw_text_with_edge(self.draw, (x + s(10), y + s(39)), info['score'], self.font_dict['score'], (255, 255, 255), image=self.image)
+        draw_text_with_edge(self.draw, (x + s(180), y + s(42)), f"[{info['grade']}]", self.font_dict['title'], (255, 255, 255), image=self.image)
 
-        draw_text_with_edge(self.draw, (x + 10, y  + 76), f'Potential: {str(song_lv)} > {ptt}', self.font_dict['text'], (255, 255, 255))
+        draw_text_with_edge(self.draw, (x + s(10), y  + s(76)), f"Potential: {str(info['song_lv'])} > {info['ptt']}", self.font_dict['text'], (255, 255, 255), image=self.image)
 
-        draw_text_with_edge(self.draw, (x + 10, y + 115), f'#{idx + 1}', self.font_dict['score'], (255, 255, 255))
-        draw_text_with_edge(self.draw, (x + 85, y + 110), f'P: {P_amount}', self.font_dict['text'], (255, 255, 255))
-        draw_text_with_edge(self.draw, (x + 85, y + 135), f'F: {F_amount} L: {L_amount}', self.font_dict['text'], (255, 255, 255))
+        draw_text_with_edge(self.draw, (x + s(10), y + s(115)), f"#{info['rank']}", self.font_dict['score'], (255, 255, 255), image=self.image)
+        draw_text_with_edge(self.draw, (x + s(85), y + s(110)), f"P: {info['P']}", self.font_dict['text'], (255, 255, 255), image=self.image)
+        draw_text_with_edge(self.draw, (x + s(85), y + s(135)), f"F: {info['F']} L: {info['L']}", self.font_dict['text'], (255, 255, 255), image=self.image)
 
 
-        draw_text_with_edge(self.draw, (x + self.box_width - 16, y + 133), date, self.font_dict['date'], (255, 255, 255), side='right')
+        draw_text_with_edge(self.draw, (x + self.box_width - s(16), y + s(133)), info['date'], self.font_dict['date'], (255, 255, 255), side='right', image=self.image)
 
+    def get_box_tile_region(self, coord):
+        # tile 包含歌曲框與右側/下方間距，溢出的文字在間距內保留
+        x, y = coord
+        return (x, y, x + self.box_width + self.padding, y + self.box_height + self.padding)
+
+    def get_header_region(self):
+        # 歌曲框右側的區域，包含日期、平均 ptt 與名牌
+        x = self.padding + self.layout.columns * (self.box_width + self.padding)
+        return (x, 0, self.img_width, self.img_height)
+
+    def get_render_state(self, box_infos):
+        """
+        記錄本次繪製使用的版面與每個 info box 的資料，供下次增量繪製比較
+        """
+        return {
+            'version': STATE_VERSION,
+            'bg_name': self.bg_name,
+            'layout': list(self.layout.key()),
+            'box_color': list(self.box_color),
+            'shadow_color': list(self.shadow_color),
+            'boxes': normalize_boxes(box_infos),
+        }
 
-        
+    def load_previous(self, previous, max_changed):
+        """
+        讀取上一次輸出的卡片作為底圖
+        :return: 需要重繪的 info box 索引，無法沿用或變更太多時回傳 None
+        """
+        changed = changed_boxes(load_state(previous), self.render_state)
+        if changed is None or len(changed) > max_changed:
+            return None
+
+        try:
+            image = Image.open(previous)
+            image = image.convert('RGB')
+        except OSError:
+            return None
+        if image.size != (self.img_width, self.img_height):
+            return None
+
+        self.image = image
+        self.draw = ImageDraw.Draw(self.image)
+        return changed
+
+    def redraw_changed(self, box_infos, r10_avg, b30_avg):
+        """
+        以底圖覆蓋變更的 info box 與名牌區域後重繪，其餘部分沿用上一次的卡片
+        """
+        template = self.get_template(len(box_infos))
+
+        header_region = self.get_header_region()
+        self.image.paste(template.crop(header_region), header_region[:2])
+        self.draw_header_text(r10_avg, b30_avg)
+        self.draw_banner((self.img_width - self.layout.s(400), self.layout.s(150)), r10_avg * 0.25 + b30_avg * 0.75, self.username)
+
+        for idx in self.changed_boxes:
+            region = self.get_box_tile_region(self.get_box_coord(idx))
+            self.image.paste(template.crop(region), region[:2])
+            self.draw_info_box(idx, box_infos[idx], self.get_box_coord(idx))
+
+    def generate_b30(self, isOnline=True, score_path='src/score.csv', credentials=None, bg_name=None, executor=None,
+                     profile=None, layout=None, previous=None, max_changed=10, pipeline=False, persist=True) -> Image:
+        """
+        :param executor: 傳入 ProcessPoolExecutor 時，30 個 info box 以 tile 形式平行繪製後再合成
+        :param profile: 已預先抓取的線上資料
+        :param layout: 本次使用的 LayoutSpec (例如 Best 50 或縮小的預覽圖)，None 時使用預設版面
+        :param previous: 上一次輸出的卡片路徑，沿用其背景並只重繪成績有變動的 info box
+        :param max_changed: 變動的 info box 超過此數量 (例如排名大幅移動) 時改為完整繪製
+        :param pipeline: 封面在背景讀取、下載與處理，同時繪製背景與名牌，每格在自己的封面完成後立即繪製
+        :param persist: 線上模式是否寫入成績 csv、成績紀錄並更新定數表，見 get_ptt_page_online
+        :return: 卡片圖片，各階段耗時與計數在 self.metrics
+        """
+        self.metrics = RenderMetrics()
+        with profiled(self.metrics, self.profiler, dump_path=self.profile_dump):
+            with self.metrics.stage('total'):
+                b30_img = self._generate_b30(isOnline, score_path, credentials, bg_name, executor, profile, layout,
+                                             previous, max_changed, pipeline, persist)
+        self.release_images()
+
+        if b30_img is None:
+            log_event('render_failed', logging.WARNING, username=self.username, **self.metrics.to_dict())
+        else:
+            log_event('render_complete', username=self.username, bg_name=self.bg_name, peak_rss_mb=peak_rss_mb(),
+                      **self.metrics.to_dict())
+        return b30_img
+
+    def release_images(self):
+        # 卡片完成後釋放本次解碼的封面、頭像與名牌，卡片本身由呼叫端持有
+        self.img_container = {}
+        self.cover_tiles = {}
+
+    def _generate_b30(self, isOnline, score_path, credentials, bg_name, executor, profile, layout, previous, max_changed,
+                      pipeline, persist):
+        self.set_layout(layout or self.default_layout)
+        if previous:
+            prev_bg = (load_state(previous) or {}).get('bg_name')
+            if prev_bg in self.assets.bg_names:
+                bg_name = prev_bg
+        self.reset(bg_name)
+        self.credentials = credentials
 
-    def generate_b30(self, isOnline=True) -> Image:
         if isOnline:
-            ret = self.get_ptt_page_online()
+            ret = self.get_ptt_page_online(profile, persist)
             if ret == 'err':
                 return None
             
         else:
-            self.get_ptt_page_offline('src/score.csv')
+            self.get_ptt_page_offline(score_path)
+        with self.metrics.stage('play_dates'):
+            self.score_data = add_play_ages(self.score_data)
         b30_avg = self.get_avg_ptt('B30')
         r10_avg = self.get_avg_ptt('R10')
         # print(b30_avg, r10_avg)
-        self.get_cover_img()
-        self.draw_background(r10_avg, b30_avg)
-        self.draw_banner((self.img_width - 400, 150), r10_avg * 0.25 + b30_avg * 0.75, self.username)
-        for idx, row in self.score_data[:30].iterrows():
-            
-            x = self.start_x + (idx % 5) * (self.box_width + self.padding)
-            y = self.start_y + (idx // 5) * (self.box_height + self.padding)
-            self.draw_info_box(idx, row, (x, y))
+        with self.metrics.stage('box_info'):
+            box_infos = [self.get_box_info(idx, row) for idx, row in self.get_box_scores().iterrows()]
+        self.render_state = self.get_render_state(box_infos)
+
+        if previous and os.path.exists(previous):
+            with self.metrics.stage('load_previous'):
+                self.changed_boxes = self.load_previous(previous, max_changed)
+        if self.changed_boxes is not None:
+            self.metrics.count('boxes_redrawn', len(self.changed_boxes))
+            with self.metrics.stage('cover_img'):
+                self.get_cover_img(self.changed_boxes)
+            with self.metrics.stage('redraw'):
+                self.redraw_changed(box_infos, r10_avg, b30_avg)
+            return self.image
+
+        with self.metrics.stage('cover_img'):
+            if pipeline:
+                self.submit_cover_tiles()
+            else:
+                self.get_cover_img()
+        with self.metrics.stage('background'):
+            self.draw_background(r10_avg, b30_avg, len(box_infos))
+        with self.metrics.stage('banner'):
+            self.draw_banner((self.img_width - self.layout.s(400), self.layout.s(150)), r10_avg * 0.25 + b30_avg * 0.75, self.username)
+
+        with self.metrics.stage('info_box'):
+            if executor is None:
+                # 依序繪製，溢出的文字才會與逐格繪製一樣被下一格的封面覆蓋
+                for idx, info in enumerate(box_infos):
+                    self.wait_cover_tile(idx)
+                    start = time.perf_counter()
+                    self.draw_info_box(idx, info, self.get_box_coord(idx))
+                    self.metrics.box_timings.append(time.perf_counter() - start)
+            else:
+                render_box_tiles(self, executor, box_infos)
+        self.metrics.count('boxes_redrawn', len(box_infos))
 
-        print('completed!')
         return self.image
+
+    def generate_b30_bytes(self, encoder=None, **kwargs):
+        """
+        產生卡片並直接編碼為 bytes，不寫入磁碟
+        :param kwargs: 傳給 generate_b30 的參數
+        :return: 編碼後的圖片，失敗時為 None
+        """
+        b30_img = self.generate_b30(**kwargs)
+        if not b30_img:
+            return None
+        with self.metrics.stage('encode'):
+            return (encoder or self.encoder).to_bytes(b30_img)
+
+    def save_b30(self, b30_img, path, encoder=None):
+        """
+        儲存卡片並在旁邊寫入本次繪製的資料，下次可傳入 previous 增量繪製
+        """
+        encoder = encoder or self.encoder
+        with self.metrics.stage('encode'):
+            encoder.save(b30_img, path)
+        save_state(path, self.render_state, encoder.is_lossless)
+        log_event('card_saved', path=path, encode_ms=round(self.metrics.timings['encode'] * 1000, 2))
         
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render an Arcaea best 30 card')
+    parser.add_argument('--backend', choices=['selenium', 'http'], default='selenium',
+                        help='how to fetch scores online, http falls back to selenium on failure')
+    parser.add_argument('--jacket-url-template',
+                        help='cover url for the http backend, formatted with the api score fields, e.g. .../{song_id}.jpg')
+    parser.add_argument('--best', type=int, default=30, help='number of boxes to draw, e.g. 40 or 50')
+    parser.add_argument('--scale', type=float, default=1.0, help='render scale, < 1 for a fast preview')
+    parser.add_argument('--format', choices=['png', 'jpeg', 'webp'], default='png', help='output image format')
+    parser.add_argument('--compress-level', type=int, default=6, help='png compression level, 0 (fast) ~ 9 (small)')
+    parser.add_argument('--quality', type=int, default=90, help='jpeg / lossy webp quality')
+    parser.add_argument('--lossless', action='store_true', help='lossless webp')
+    parser.add_argument('--incremental', action='store_true', help='only redraw boxes that changed since the last card')
+    parser.add_argument('--pipeline', action='store_true', help='draw the card while covers are still downloading')
+    parser.add_argument('--log-json', action='store_true', help='emit structured json logs')
+    parser.add_argument('--profiler', choices=['cprofile', 'tracemalloc'], help='profile the render and log the result')
+    parser.add_argument('--profile-dump', help='also write the cProfile stats to this file')
+    args = parser.parse_args()
+
+    setup_logging(json_format=args.log_json)
+    layout = LayoutSpec.best(args.best, scale=args.scale)
+    encoder = OutputEncoder(args.format, compress_level=args.compress_level, quality=args.quality, lossless=args.lossless)
+    arcaea_render = B30Render(fetch_backend=args.backend, layout=layout, encoder=encoder, profiler=args.profiler,
+                              profile_dump=args.profile_dump, jacket_url_template=args.jacket_url_template)
     
-    arcaea_render = B30Render()
-    
-    b30_img = arcaea_render.generate_b30(isOnline=True)
+    out_path = encoder.output_path('B30.png')
+    b30_img = arcaea_render.generate_b30(isOnline=True, previous=out_path if args.incremental else None,
+                                         pipeline=args.pipeline)
     if b30_img:
-        b30_img.save('B30.png')
+        arcaea_render.save_b30(b30_img, out_path)
     
\ No newline at end of file
@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, unquote, urlparse
+
+import requests
+
+from main import B30Render
+from tools.assets import LayoutAssets
+from tools.cover_cache import CoverTileCache
+from tools.encoder import OutputEncoder
+from tools.instrument import log_event, setup_logging
+from tools.layout import LayoutSpec
+from tools.score_table import build_score_table, read_score_csv
+from tools.scoring import add_play_ages
+
+# 請求可指定的版面範圍，縮放只允許固定幾種，素材與底圖快取才不會無限增加
+MAX_BEST = 50
+SCALES = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0)
+
+
+def parse_layout(query):
+    """
+    best 限制在 1 ~ MAX_BEST，scale 取最接近的 SCALES
+    """
+    best = min(max(int(query.get('best', 30)), 1), MAX_BEST)
+    scale = float(query.get('scale', 1))
+    if not math.isfinite(scale):
+        raise ValueError(f'invalid scale: {scale}')
+    scale = min(SCALES, key=lambda allowed: abs(allowed - scale))
+    return LayoutSpec.best(best, scale=scale)
+
+
+class CardCache:
+    """
+    已渲染卡片的記憶體快取 (LRU)，並記錄每位玩家最近一次的卡片
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._cards = OrderedDict()
+        self._users = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._cards:
+                return None
+            self._cards.move_to_end(key)
+            return self._cards[key]
+
+    def put(self, key, username, content, mimetype):
+        with self._lock:
+            if key in self._cards:
+                self._total_bytes -= len(self._cards.pop(key)[0])
+            self._cards[key] = (content, mimetype)
+            self._users[username] = key
+            self._total_bytes += len(content)
+
+            while self._total_bytes > self.max_bytes and len(self._cards) > 1:
+                _, (old_content, _) = self._cards.popitem(last=False)
+                self._total_bytes -= len(old_content)
+
+    def get_user(self, username):
+        with self._lock:
+            key = self._users.get(username)
+        return self.get(key) if key else None
+
+
+class RenderService:
+    """
+    常駐的卡片渲染服務
+    字體、版面素材、底圖與封面 tile 保留在記憶體，相同的成績資料直接回傳快取的卡片
+    """
+
+    def __init__(self, render=None, cache=None, encoder=None):
+        self.encoder = encoder or OutputEncoder()
+        if render is None:
+            render = B30Render(assets=LayoutAssets(), cover_cache=CoverTileCache('src/cover_img/.tiles', memory_items=256),
+                               encoder=self.encoder)
+        self.render = render
+        self.cache = cache or CardCache()
+        # B30Render 保存單張卡片的狀態，同時只渲染一張
+        self._render_lock = threading.Lock()
+
+    def parse_scores(self, body, content_type):
+        """
+        :param body: 成績 csv，或 {"username": ..., "rows": [...], "img_src_arr": [...]} 格式的 json
+        :return: generate_b30 使用的 profile，成績表 (score_data) 在此建立一次，錯誤的資料在渲染前回應 400
+        """
+        if 'json' in content_type:
+            profile = json.loads(body)
+            if isinstance(profile, list):
+                profile = {'rows': profile}
+            if not profile.get('rows'):
+                raise ValueError('no scores found in request body')
+            profile['score_data'] = build_score_table(profile.pop('rows'))
+        else:
+            profile = {'score_data': read_score_csv(BytesIO(body))}
+
+        if profile['score_data'].empty:
+            raise ValueError('no scores found in request body')
+        profile.setdefault('username', 'User001')
+        profile.setdefault('img_src_arr', [])
+        return profile
+
+    def choose_bg(self, username):
+        # 同一位玩家固定使用同一張背景，結果才能被快取
+        bg_names = self.render.assets.bg_names
+        return bg_names[zlib.crc32(username.encode('utf-8')) % len(bg_names)]
+
+    def cache_key(self, profile, bg_name, layout, encoder):
+        """
+        以成績資料、版面、背景、輸出格式、卡片上的日期與各成績顯示的經過時間 (s/m/h/d) 計算快取 key
+        經過時間改變時 (例如 5h 變為 6h) 重新渲染
+        """
+        ages = add_play_ages(profile['score_data'])['age'].tolist()
+        payload = json.dumps([profile['username'], profile['score_data'].to_json(orient='records'), bg_name,
+                              layout.key(), encoder.save_kwargs(), datetime.now().strftime('%Y/%m/%d'), ages],
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def render_card(self, profile, bg_name=None, layout=None, encoder=None):
+        """
+        :return: (圖片 bytes, mimetype, 是否命中快取)
+        """
+        layout = layout or self.render.default_layout
+        encoder = encoder or self.encoder
+        if bg_name is not None and bg_name not in self.render.assets.bg_names:
+            raise ValueError(f'unknown bg: {bg_name}')
+        bg_name = bg_name or self.choose_bg(profile['username'])
+
+        key = self.cache_key(profile, bg_name, layout, encoder)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.put(key, profile['username'], *cached)
+            return cached[0], cached[1], True
+
+        with self._render_lock:
+            # 只渲染，不寫入本機的成績 csv 與成績紀錄，未知的歌曲直接回應 400
+            content = self.render.generate_b30_bytes(encoder, isOnline=True, profile=profile, bg_name=bg_name,
+                                                     layout=layout, persist=False)
+        if content is None:
+            raise ValueError('failed to render card')
+
+        self.cache.put(key, profile['username'], content, encoder.mimetype)
+        return content, encoder.mimetype, False
+
+
+def make_handler(service):
+
+    class RenderHandler(BaseHTTPRequestHandler):
+
+        def send_body(self, status, content, content_type, headers=None):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def send_error_text(self, status, message):
+            self.send_body(status, message.encode('utf-8'), 'text/plain; charset=utf-8')
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != '/render':
+                return self.send_error_text(404, 'not found')
+
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                if length < 0:
+                    raise ValueError(f'invalid Content-Length: {length}')
+                body = self.rfile.read(length)
+                profile = service.parse_scores(body, self.headers.get('Content-Type', ''))
+                if 'user' in query:
+                    profile['username'] = query['user']
+
+                layout = parse_layout(query)
+                encoder = OutputEncoder(query['format']) if 'format' in query else None
+                content, mimetype, hit = service.render_card(profile, query.get('bg'), layout, encoder)
+            except (ValueError, KeyError) as e:
+                return self.send_error_text(400, str(e))
+            except requests.RequestException as e:
+                # 頭像或封面下載失敗
+                log_event('render_request_failed', logging.WARNING, error=str(e))
+                return self.send_error_text(502, f'failed to fetch images: {e}')
+            except Exception as e:
+                # OSError 等其他錯誤也要回應，不直接中斷連線
+                log_event('render_request_failed', logging.ERROR, error=repr(e))
+                return self.send_error_text(500, 'failed to render card')
+
+            self.send_body(200, content, mimetype, {'X-Cache': 'hit' if hit else 'miss'})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if not url.path.startswith('/card/'):
+                return self.send_error_text(404, 'not found')
+
+            cached = service.cache.get_user(unquote(url.path[len('/card/'):]))
+            if cached is None:
+                return self.send_error_text(404, 'card not rendered yet')
+            self.send_body(200, cached[0], cached[1], {'X-Cache': 'hit'})
+
+    return RenderHandler
+
+
+def serve(host='127.0.0.1', port=8000, service=None):
+    server = ThreadingHTTPServer((host, port), make_handler(service or RenderService()))
+    log_event('serving', url=f'http://{host}:{port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve B30 cards over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--template-dir', help='also cache the static card backgrounds on disk')
+    parser.add_argument('--log-json', action='store_true', help='emit structured json logs')
+    args = parser.parse_args()
+
+    setup_logging(json_format=args.log_json)
+
+    render = B30Render(assets=LayoutAssets(TEMPLATE_DIR=args.template_dir),
+                       cover_cache=CoverTileCache('src/cover_img/.tiles', memory_items=256))
+    serve(args.host, args.port, RenderService(render))
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from tools.cover_cache import CoverTileCache, make_cover_tile, make_cover_tiles
+from tools.layout import LayoutSpec
+
+
+def make_covers(sizes=((64, 64), (80, 72), (48, 96))):
+    # 固定亂數種子的小封面，尺寸不同以涵蓋縮放
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)) for width, height in sizes]
+
+
+def tile_params(layout):
+    # 與 B30Render.set_layout 相同
+    return {'box_size': (layout.box_width, layout.box_height), 'crop_top': layout.s(10), 'blur_radius': 3 * layout.scale}
+
+
+# 與 server.SCALES 相同，包含 0.75 (模糊半徑 2.25) 等小數半徑
+@pytest.mark.parametrize('scale', [0.25, 0.5, 0.75, 1.0, 1.5, 2.0])
+def test_batched_effects_match_pil(scale):
+    covers = make_covers()
+    params = tile_params(LayoutSpec(scale=scale))
+
+    pil_tiles = [make_cover_tile(cover_img, **params) for cover_img in covers]
+    numpy_tiles = make_cover_tiles(covers, **params)
+
+    for pil_tile, numpy_tile in zip(pil_tiles, numpy_tiles):
+        assert numpy_tile.size == pil_tile.size
+        assert np.array_equal(np.asarray(numpy_tile), np.asarray(pil_tile))
+
+
+def test_put_many_batch_effects(tmp_path):
+    covers = [(f'song{i}', f'song{i}.jpg', cover_img) for i, cover_img in enumerate(make_covers())]
+    params = tile_params(LayoutSpec(scale=0.5))
+
+    pil_tiles = CoverTileCache(str(tmp_path / 'pil')).put_many(covers, **params)
+    numpy_tiles = CoverTileCache(str(tmp_path / 'numpy'), batch_effects=True).put_many(covers, **params)
+
+    for pil_tile, numpy_tile in zip(pil_tiles, numpy_tiles):
+        assert np.array_equal(np.asarray(numpy_tile), np.asarray(pil_tile))
@@ -0,0 +1,37 @@
+import pytest
+
+from tools.layout import LayoutSpec
+from tools.score_table import build_score_table, count_best
+
+
+def make_rows(n, recent=None):
+    rows = [{'difficulty': 'FTR', 'title': f'song{i}', 'score': 9800000 + i, 'date': '2024/01/01 下午01:00',
+             'P': 1000, 'F': 0, 'L': 0} for i in range(n)]
+    if recent is not None:
+        for row, flag in zip(rows, recent):
+            row['recent'] = flag
+    return rows
+
+
+@pytest.mark.parametrize('n, rows', [(30, 6), (31, 7), (42, 9), (50, 10)])
+def test_best_keeps_n(n, rows):
+    layout = LayoutSpec.best(n)
+    assert layout.n_boxes == n
+    assert layout.rows == rows
+
+
+def test_default_recent_marker():
+    # 沒有 recent 欄位時，超過 30 筆的成績表最後 10 筆為 R10
+    assert count_best(build_score_table(make_rows(40))) == 30
+    assert count_best(build_score_table(make_rows(30))) == 30
+
+
+def test_recent_marker_from_rows():
+    score_data = build_score_table(make_rows(45, [False] * 35 + ['True'] * 10))
+    assert count_best(score_data) == 35
+    assert score_data['recent'].sum() == 10
+
+
+def test_recent_must_come_last():
+    with pytest.raises(ValueError):
+        build_score_table(make_rows(3, [False, True, False]))
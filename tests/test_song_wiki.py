@@ -0,0 +1,49 @@
+import math
+import os
+
+from tools.song_store import SongConstantStore
+from tools.song_wiki import parse_song_table, update_from_html
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'song_table.html')
+
+
+def read_fixture():
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_parse_song_table():
+    html = read_fixture()
+    rows, content_hash = parse_song_table([html])
+
+    # 略過表頭、不足六格的資料列與第二個表格
+    assert [row[0] for row in rows] == ['Sayonara Hatsukoi', 'Grievous Lady', 'Testify', 'Tom & Jerry', 'Testify']
+    assert rows[1] == ['Grievous Lady', '4.0', '7.5', '11.3', '', '']
+
+    # 分段讀取的結果與雜湊相同
+    chunks = [html[i:i + 37] for i in range(0, len(html), 37)]
+    assert parse_song_table(chunks) == (rows, content_hash)
+
+
+def test_update_from_html(tmp_path):
+    store = SongConstantStore(str(tmp_path / 'songs.sqlite'))
+    html = read_fixture()
+
+    # 重複的歌名只保留第一筆
+    assert update_from_html(store, html) == {'status': 'updated', 'added': 4, 'changed': 0}
+    assert store.get('Testify', 'BYD') == 12.0
+    assert math.isnan(store.get('Grievous Lady', 'BYD'))
+
+    # 內容雜湊相同時不寫入
+    assert update_from_html(store, html) == {'status': 'unchanged', 'added': 0, 'changed': 0}
+
+    # 新增一首、變更一首
+    updated = html.replace('<td>11.3</td>', '<td>11.4</td>').replace(
+        '<tr><td colspan="3">', '<tr><td>New Song</td><td>2.0</td><td>5.0</td><td>8.0</td><td></td><td></td></tr>\n'
+                                '<tr><td colspan="3">')
+    assert update_from_html(store, updated) == {'status': 'updated', 'added': 1, 'changed': 1}
+
+    reloaded = SongConstantStore.load(store.path)
+    assert reloaded.get('Grievous Lady', 'FTR') == 11.4
+    assert reloaded.get('New Song', 'FTR') == 8.0
+    assert len(reloaded) == 5
@@ -0,0 +1,80 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools.web_client import ArcaeaWebClient, LoginError
+
+PROFILE = {'display_name': 'Tester', 'avatar_url': 'http://example.com/avatar.png'}
+RATING = {
+    'best_rated_scores': [
+        {'song_id': 'testify', 'title': {'en': 'Testify'}, 'difficulty': 3, 'score': 9912345, 'time_played': 1700000000000,
+         'perfect_count': 1500, 'near_count': 3, 'miss_count': 1},
+    ],
+    'recent_rated_scores': [
+        {'song_id': 'grievous', 'title': 'Grievous Lady', 'difficulty': 2, 'score': 9800000, 'time_played': 1700000000000,
+         'jacket_url': 'http://example.com/grievous.jpg'},
+    ],
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Arcaea Online web API 的本機替代伺服器
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 200 and self.path == '/auth/login':
+            self.send_header('Set-Cookie', 'sid=stub; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.headers.get('Authorization') == 'Basic dXNlcjpwYXNz':  # user:pass
+            return self.send_json(200, {'isLoggedIn': True})
+        self.send_json(401, {'isLoggedIn': False})
+
+    def do_GET(self):
+        if 'sid=stub' not in self.headers.get('Cookie', ''):
+            return self.send_json(403, {'success': False})
+        values = {'/webapi/user/me': PROFILE, '/webapi/score/rating/me': RATING}
+        if self.path not in values:
+            return self.send_json(404, {'success': False})
+        self.send_json(200, {'success': True, 'value': values[self.path]})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch(base_url):
+    client = ArcaeaWebClient(base_url, jacket_url_template='http://example.com/{song_id}.jpg')
+    profile = client.fetch('user', 'pass')
+
+    assert profile['username'] == 'Tester'
+    assert [row['title'] for row in profile['rows']] == ['Testify', 'Grievous Lady']
+    assert [row['difficulty'] for row in profile['rows']] == ['BYD', 'FTR']
+    assert profile['rows'][0]['score'] == '9,912,345'
+    assert profile['rows'][0]['grade'] == 'EX+'
+    assert profile['img_src_arr'] == ['http://example.com/testify.jpg', 'http://example.com/grievous.jpg']
+
+
+def test_fetch_without_jacket_template(base_url):
+    profile = ArcaeaWebClient(base_url).fetch('user', 'pass')
+    assert profile['img_src_arr'] == [None, 'http://example.com/grievous.jpg']
+
+
+def test_login_failed(base_url):
+    with pytest.raises(LoginError):
+        ArcaeaWebClient(base_url).fetch('user', 'wrong')
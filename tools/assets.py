@@ -0,0 +1,218 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from tools.utils import adaptive_resize
+
+FONT_SIZES = {
+    'title': 26,
+    'score': 30,
+    'text': 22,
+    'date': 24,
+    'ptt_dec': 40,
+    'ptt_fixed': 30,
+    'p_name': 50,
+}
+
+
+class LayoutAssets:
+    """
+    共用的版面素材 (字體、難度標籤、背景、側邊圖、陰影)
+    第一次使用時才解碼，之後各張卡片只讀取不修改，可在多位玩家之間共用
+    """
+
+    def __init__(self,
+                 BG_IMG_DIR='src/bg_img',
+                 FONT_DIR='src/font',
+                 DIFF_IMG_DIR='src/diff_img',
+                 LAYOUT_IMG_DIR='src/layout_img',
+                 AVATAR_IMG_DIR='src/avatar_img',
+                 TEMPLATE_DIR=None,
+                 max_templates=8,
+                 max_images=32,
+                 ):
+
+        self.BG_IMG_DIR = BG_IMG_DIR
+        self.DIFF_IMG_DIR = DIFF_IMG_DIR
+        self.LAYOUT_IMG_DIR = LAYOUT_IMG_DIR
+        self.AVATAR_IMG_DIR = AVATAR_IMG_DIR
+        # 底圖的磁碟快取目錄，None 時只快取在記憶體
+        self.TEMPLATE_DIR = TEMPLATE_DIR
+
+        self.font_path = f'{FONT_DIR}/Exo-SemiBold.ttf'
+        self.bg_names = sorted(os.listdir(BG_IMG_DIR))
+
+        # 依畫布尺寸縮放後的素材，背景、側邊圖與底圖依畫布尺寸而異，只保留最近使用的幾張
+        self._scaled_cache = {}
+        self._bg_cache = LRUCache(max_images)
+        self._side_cache = LRUCache(max_images)
+        self._shadow_cache = {}
+        self._template_cache = LRUCache(max_templates)
+
+    # 字體與圖片素材在第一次存取時才載入，底圖命中磁碟快取時 bg_mask 與側邊圖都不必解碼
+    @cached_property
+    def font_dict(self):
+        return {name: ImageFont.truetype(self.font_path, size) for name, size in FONT_SIZES.items()}
+
+    @cached_property
+    def diff_tag_img_dict(self):
+        return {diff: _load(f'{self.DIFF_IMG_DIR}/{diff}.png') for diff in ['PST', 'PRS', 'FTR', 'BYD', 'ETR']}
+
+    @cached_property
+    def bg_mask(self):
+        return _load(f'{self.LAYOUT_IMG_DIR}/bg_mask.png')
+
+    @cached_property
+    def side_img(self):
+        return _load(f'{self.LAYOUT_IMG_DIR}/side2.png')
+
+    @cached_property
+    def side_img_shadow(self):
+        return _load(f'{self.LAYOUT_IMG_DIR}/side_shadow.png')
+
+    @cached_property
+    def avatar_bg(self):
+        return _load(os.path.join(self.AVATAR_IMG_DIR, 'ava_bg.png')).resize((216, 216))
+
+    def get_background(self, name, size):
+        """
+        回傳裁切至畫布大小的背景圖
+        :param name: 必須是 bg_names 之一，不接受其他路徑
+        """
+        if name not in self.bg_names:
+            raise ValueError(f'unknown background: {name}')
+        def build():
+            img_width, img_height = size
+            bg_img = _load(f'{self.BG_IMG_DIR}/{name}')
+
+            # 將背景圖片裁切至畫布大小
+            if img_width > bg_img.width or img_height > bg_img.height:
+                max_length = max(img_width, img_height)
+                if max_length > bg_img.width:
+                    bg_img = adaptive_resize(bg_img, (max_length, '*'))
+                else:
+                    bg_img = adaptive_resize(bg_img, ('*', max_length))
+
+            return bg_img.crop((bg_img.width // 2 - img_width // 2, bg_img.height // 2 - img_height // 2,
+                                bg_img.width // 2 + img_width // 2, bg_img.height // 2 + img_height // 2))
+
+        return self._bg_cache.get_or_build((name, size), build)
+
+    def _get_scaled(self, name, scale, build):
+        if scale == 1:
+            return getattr(self, name)
+        if (name, scale) not in self._scaled_cache:
+            self._scaled_cache[(name, scale)] = build()
+        return self._scaled_cache[(name, scale)]
+
+    def get_fonts(self, scale=1):
+        return self._get_scaled('font_dict', scale, lambda: {
+            name: ImageFont.truetype(self.font_path, max(int(round(size * scale)), 1)) for name, size in FONT_SIZES.items()
+        })
+
+    def get_diff_tags(self, scale=1):
+        return self._get_scaled('diff_tag_img_dict', scale, lambda: {
+            diff: _scale_img(img, scale) for diff, img in self.diff_tag_img_dict.items()
+        })
+
+    def get_avatar_bg(self, scale=1):
+        return self._get_scaled('avatar_bg', scale, lambda: _scale_img(self.avatar_bg, scale))
+
+    def get_bg_mask(self, img_height, scale=1):
+        """
+        回傳配合畫布高度的背景遮罩
+        """
+        if img_height == self.bg_mask.height and scale == 1:
+            return self.bg_mask
+        key = ('bg_mask', img_height, scale)
+        if key not in self._scaled_cache:
+            self._scaled_cache[key] = self.bg_mask.resize((int(round(self.bg_mask.width * scale)), img_height))
+        return self._scaled_cache[key]
+
+    def get_side_images(self, img_height, scale=1):
+        """
+        回傳依畫布高度縮放後的 (側邊圖, 側邊陰影)
+        """
+        return self._side_cache.get_or_build((img_height, scale), lambda: (
+            adaptive_resize(self.side_img, ('*', img_height + int(round(120 * scale)))),
+            adaptive_resize(self.side_img_shadow, ('*', img_height + int(round(140 * scale)))),
+        ))
+
+    def get_box_shadow(self, box_size, margin, blur_radius, color=(0, 0, 0)):
+        """
+        回傳已模糊的歌曲框陰影
+        """
+        key = (box_size, margin, blur_radius, color)
+        if key not in self._shadow_cache:
+            box_width, box_height = box_size
+            shadow_layer = Image.new('RGBA', (box_width + margin * 2, box_height + margin * 2), (0, 0, 0, 1))
+            ImageDraw.Draw(shadow_layer).rectangle([margin, margin, box_width + margin, box_height + margin], fill=color)
+            # 应用模糊滤镜
+            self._shadow_cache[key] = shadow_layer.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+        return self._shadow_cache[key]
+
+    def get_template(self, key, build):
+        """
+        回傳快取的卡片底圖，不存在時呼叫 build() 建立
+        :param key: 底圖參數，第一個元素為背景檔名
+        """
+        return self._template_cache.get_or_build(key, lambda: self._load_template(key, build))
+
+    def _load_template(self, key, build):
+        path = None
+        if self.TEMPLATE_DIR:
+            # 背景檔案變更時重新建立
+            bg_stat = os.stat(f'{self.BG_IMG_DIR}/{key[0]}')
+            digest = hashlib.sha1(repr((key, bg_stat.st_size, bg_stat.st_mtime_ns)).encode('utf-8')).hexdigest()
+            path = os.path.join(self.TEMPLATE_DIR, f'{digest}.png')
+
+        if path and os.path.exists(path):
+            template = _load(path)
+        else:
+            template = build()
+            if path:
+                os.makedirs(self.TEMPLATE_DIR, exist_ok=True)
+                template.save(f'{path}.{os.getpid()}.tmp', format='PNG', compress_level=1)
+                os.replace(f'{path}.{os.getpid()}.tmp', path)
+        return template
+
+
+class LRUCache:
+    """
+    記憶體快取，超過 max_items 筆時移除最久未使用的項目
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+
+        value = build()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _scale_img(img, scale):
+    return img.resize((max(int(round(img.width * scale)), 1), max(int(round(img.height * scale)), 1)))
+
+
+def _load(path):
+    img = Image.open(path)
+    img.load()
+    return img
@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException, TimeoutException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from tools.instrument import log_event
+from tools.web_client import LoginError
+
+POTENTIAL_URL = 'https://arcaea.lowiro.com/zh/profile/potential'
+PROFILE_URL = 'https://arcaea.lowiro.com/zh/profile/'
+CARD_SELECTOR = 'div[data-v-337fbd7d].card-list div[data-v-337fbd7d].card'
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path(cache_file='src/.chromedriver_path', refresh=False):
+    """
+    取得 chromedriver 路徑，只在第一次 (或快取的路徑失效時) 呼叫 ChromeDriverManager
+    :param refresh: 忽略快取重新取得，Chrome 更新後快取的 driver 版本不符時使用
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if not refresh and _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+
+        if not refresh and os.path.exists(cache_file):
+            with open(cache_file, 'r') as f:
+                cached_path = f.read().strip()
+            if os.path.exists(cached_path):
+                _driver_path = cached_path
+                return _driver_path
+
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        _driver_path = ChromeDriverManager().install()
+        with open(cache_file, 'w') as f:
+            f.write(_driver_path)
+        return _driver_path
+
+
+class DriverPool:
+    """
+    保持最多 size 個 headless Chrome，帳號之間清除 cookie 後重複使用
+    """
+
+    def __init__(self, options, size=1):
+        self.options = options
+        self.size = size
+        self._idle = []
+        self._drivers = []
+        # 已建立與建立中的瀏覽器數量，建立 Chrome 時不持有 lock
+        self._slots = 0
+        # 歸還或移除瀏覽器時通知等待中的 acquire
+        self._cond = threading.Condition()
+
+    def _create_driver(self):
+        try:
+            return webdriver.Chrome(service=Service(resolve_driver_path()), options=self.options)
+        except SessionNotCreatedException as e:
+            # 快取的 chromedriver 與已更新的 Chrome 版本不符，重新取得後再試一次
+            log_event('chromedriver_refresh', logging.WARNING, error=str(e).splitlines()[0] if str(e) else '')
+            return webdriver.Chrome(service=Service(resolve_driver_path(refresh=True)), options=self.options)
+
+    @contextmanager
+    def acquire(self):
+        driver = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    driver = self._idle.pop()
+                    break
+                if self._slots < self.size:
+                    # 先保留位置，在 lock 外啟動瀏覽器，其他 acquire 與歸還不需等待
+                    self._slots += 1
+                    break
+                self._cond.wait()
+
+        if driver is None:
+            try:
+                driver = self._create_driver()
+            except BaseException:
+                with self._cond:
+                    self._slots -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._drivers.append(driver)
+
+        try:
+            yield driver
+        finally:
+            try:
+                driver.delete_all_cookies()
+                with self._cond:
+                    self._idle.append(driver)
+                    self._cond.notify()
+            except Exception:
+                # 瀏覽器已失效，移出 pool，等待中的 acquire 改為建立新的瀏覽器
+                with self._cond:
+                    self._drivers.remove(driver)
+                    self._slots -= 1
+                    self._cond.notify()
+                driver.quit()
+
+    def close(self):
+        with self._cond:
+            for driver in self._drivers:
+                driver.quit()
+            self._drivers = []
+            self._idle = []
+            self._slots = 0
+            self._cond.notify_all()
+        log_event('browser_closed', logging.DEBUG)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def scrape_profile(driver, username_input, password_input, timeouts):
+    """
+    登入 Arcaea Online 並讀取潛力值頁面
+    :return: dict，包含 username、cards (卡片文字)、img_src_arr、avatar/rating_bg/banner 圖片網址、timings
+    """
+    timings = {}
+
+    def timed_wait(stage, timeout, condition):
+        # 等待條件成立並記錄耗時
+        start = time.perf_counter()
+        try:
+            return WebDriverWait(driver, timeout).until(condition)
+        except TimeoutException:
+            raise TimeoutException(f'{stage} not ready after {timeout}s')
+        finally:
+            timings[stage] = round(time.perf_counter() - start, 3)
+
+    driver.get(POTENTIAL_URL)
+    timed_wait('login_form', timeouts['page'], EC.presence_of_element_located((By.CSS_SELECTOR, "input[name='user']")))
+
+    username = driver.find_element(By.CSS_SELECTOR, "input[name='user']")
+    password = driver.find_element(By.CSS_SELECTOR, "input[name='password']")
+
+    username.send_keys(username_input)
+    password.send_keys(password_input)
+
+    driver.find_element(By.CSS_SELECTOR, "input[type='submit']").click()
+
+    # 等待成績卡片出現或登入失敗訊息
+    timed_wait('login', timeouts['login'],
+               lambda d: d.find_elements(By.CSS_SELECTOR, CARD_SELECTOR) or '登入失败' in d.page_source)
+
+    if '登入失败' in driver.page_source:
+        raise LoginError('login failed')
+
+    # 獲取頁面資訊
+    cards = [result.text for result in driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)]
+    img_results = driver.find_elements(By.CSS_SELECTOR, f'{CARD_SELECTOR} div[data-v-3d1a04fb].section-2 img')
+
+    profile = {
+        'cards': cards,
+        'img_src_arr': [img.get_attribute('src') for img in img_results],
+        'username': timed_wait('username', timeouts['page'],
+                               EC.visibility_of_element_located((By.CSS_SELECTOR, "span[class='username']"))).text,
+        'avatar_url': driver.find_element(By.CSS_SELECTOR, 'div[data-v-f7bc1a70].profile-image')
+                            .get_attribute('style').split('"')[1],
+        'rating_bg_url': driver.find_element(By.CSS_SELECTOR, 'div[data-v-f7bc1a70].profile-image div[data-v-f7bc1a70]')
+                               .get_attribute('style').split('"')[1],
+    }
+
+    # 名牌背景
+    driver.get(PROFILE_URL)
+    banner = timed_wait('banner', timeouts['page'],
+                        lambda d: next((img for img in d.find_elements(By.CSS_SELECTOR, "img[class='profile-banner__banner']")
+                                        if img.get_attribute('src')), False))
+    profile['banner_url'] = banner.get_attribute('src')
+    profile['timings'] = timings
+
+    return profile
+
+
+def fetch_many(pool, accounts, timeouts):
+    """
+    以 pool 中的瀏覽器同時抓取多個帳號，同時運作的瀏覽器數量不超過 pool.size
+    :return: 依 accounts 順序的結果，失敗的帳號為 Exception
+    """
+    def fetch(account):
+        try:
+            with pool.acquire() as driver:
+                return scrape_profile(driver, *account, timeouts)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        return list(executor.map(fetch, accounts))
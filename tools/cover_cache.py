@@ -0,0 +1,244 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+
+# 下載的封面縮小至此尺寸以內再存檔
+COVER_MAX_SIZE = 512
+
+
+def open_cover(path, size):
+    """
+    開啟封面圖，JPEG 以 draft 模式直接解碼為不小於 size 的 1/2、1/4 或 1/8 尺寸，不必先解碼完整大圖
+    """
+    cover_img = Image.open(path)
+    cover_img.draft('RGB', (size, size))
+    return cover_img
+
+
+def save_cover(cover_img, path, max_size=COVER_MAX_SIZE):
+    """
+    縮小至 max_size 以內後存為 JPEG
+    :return: 縮小後的封面圖
+    """
+    if max(cover_img.size) > max_size:
+        cover_img = cover_img.copy()
+        cover_img.thumbnail((max_size, max_size))
+    cover_img = cover_img.convert('RGB')
+
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    cover_img.save(tmp_path, format='JPEG', quality=95)
+    os.replace(tmp_path, path)
+    return cover_img
+
+
+def make_cover_tile(cover_img, box_size, crop_top=10, blur_radius=3, darken=0.5):
+    """
+    將封面圖處理為 info box 底圖: 縮放、裁切、模糊、調暗
+    """
+    box_width, box_height = box_size
+
+    # 裁切封面圖至歌曲框大小
+    song_img = cover_img.resize((box_width + 1, box_width + 1))
+    song_img = song_img.crop((0, crop_top, box_width + 1, crop_top + box_height + 1))
+
+    # 高斯模糊
+    song_img = song_img.filter(ImageFilter.BoxBlur(blur_radius))
+
+    # 調暗圖片，查表只建立一次
+    return song_img.point(darken_lut(darken).tolist() * len(song_img.getbands()))
+
+
+def make_cover_tiles(cover_imgs, box_size, crop_top=10, blur_radius=3, darken=0.5):
+    """
+    一次處理多張封面: 縮放與裁切逐張進行，模糊與調暗疊成一個 numpy 陣列以向量運算完成
+    結果與逐張呼叫 make_cover_tile 相同，非 RGB 的封面改走 make_cover_tile
+    """
+    box_width, box_height = box_size
+    tiles = [None] * len(cover_imgs)
+    crops = []
+    for i, cover_img in enumerate(cover_imgs):
+        if cover_img.mode != 'RGB':
+            tiles[i] = make_cover_tile(cover_img, box_size, crop_top, blur_radius, darken)
+            continue
+        song_img = cover_img.resize((box_width + 1, box_width + 1))
+        crops.append((i, np.asarray(song_img.crop((0, crop_top, box_width + 1, crop_top + box_height + 1)))))
+
+    if crops:
+        # (張數, 高, 寬, 3)
+        batch = np.stack([crop for _, crop in crops])
+        if blur_radius:
+            batch = box_blur(box_blur(batch, blur_radius, axis=2), blur_radius, axis=1)
+        batch = darken_lut(darken)[batch]
+        for (i, _), tile in zip(crops, batch):
+            tiles[i] = Image.fromarray(tile, 'RGB')
+    return tiles
+
+
+def box_blur(arr, radius, axis):
+    """
+    沿 axis 做與 PIL BoxBlur 相同的定點數運算: 視窗為 2r+1 個像素，
+    小數半徑的部分加權於視窗外側的兩個像素，邊緣重複最外側像素
+    權重總和為 1 << 24，uint8 的加權和不會超過 uint32
+    PIL 以 C 的 float 計算權重，這裡同樣用 float32，否則 2.25 等半徑的權重會差 1
+    """
+    r = int(radius)
+    ww = int(np.float32(1 << 24) / (np.float32(radius) * np.float32(2) + np.float32(1)))
+    fw = ((1 << 24) - (r * 2 + 1) * ww) // 2
+
+    n = arr.shape[axis]
+    pad_width = [(0, 0)] * arr.ndim
+    pad_width[axis] = (r + 1, r + 1)
+    padded = np.pad(arr, pad_width, mode='edge')
+
+    def window(start):
+        index = [slice(None)] * arr.ndim
+        index[axis] = slice(start, start + n)
+        return tuple(index)
+
+    # 2r+1 個 uint8 相加不會超過 uint16
+    acc = padded[window(1)].astype(np.uint16)
+    for start in range(2, 2 * r + 2):
+        acc += padded[window(start)]
+
+    out = acc.astype(np.uint32) * np.uint32(ww)
+    if fw:
+        out += (padded[window(0)].astype(np.uint32) + padded[window(2 * r + 2)]) * np.uint32(fw)
+    out += np.uint32(1 << 23)
+    out >>= np.uint32(24)
+    return out.astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def darken_lut(darken):
+    # 與 Image.point 傳入函式時相同，以 round 建表
+    return np.array([min(max(round(i * darken), 0), 255) for i in range(256)], dtype=np.uint8)
+
+
+class CoverTileCache:
+    """
+    已處理完成的封面 tile 磁碟快取
+    以歌名、處理參數與原始封面檔案資訊為 key，超過容量時刪除最久未使用的 tile
+    memory_items 大於 0 時另在記憶體保留最近使用的 tile (常駐服務使用)
+    batch_effects 為 True 時 put_many 以 numpy 一次處理所有封面的模糊與調暗，結果與 PIL 相同
+    可由多個 thread 同時讀寫 (管線模式)
+    """
+
+    def __init__(self, cache_dir='src/cover_img/.tiles', max_bytes=64 * 1024 * 1024, memory_items=0, batch_effects=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.batch_effects = batch_effects
+        self._memory = OrderedDict()
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, title, cover_path, tile_params):
+        try:
+            stat = os.stat(cover_path)
+            source_key = f'{stat.st_size}:{stat.st_mtime_ns}'
+        except OSError:
+            source_key = ''
+
+        params_key = repr(sorted(tile_params.items()))
+        key = hashlib.sha1(f'{title}\0{params_key}\0{source_key}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.png')
+
+    def get(self, title, cover_path, **tile_params):
+        """
+        讀取快取的 tile，不存在時回傳 None
+        :param tile_params: make_cover_tile 的參數
+        """
+        path = self._path(title, cover_path, tile_params)
+        with self._lock:
+            if path in self._memory:
+                self._memory.move_to_end(path)
+                return self._memory[path]
+
+        try:
+            tile = Image.open(path)
+            tile.load()
+        except (OSError, ValueError):
+            return None
+
+        # 更新存取時間作為 LRU 依據
+        os.utime(path)
+        self._remember(path, tile)
+        return tile
+
+    def _remember(self, path, tile):
+        if not self.memory_items:
+            return
+        with self._lock:
+            self._memory[path] = tile
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def put(self, title, cover_path, cover_img, **tile_params):
+        """
+        處理封面圖並寫入快取，回傳處理後的 tile
+        """
+        return self._store(title, cover_path, make_cover_tile(cover_img, **tile_params), tile_params)
+
+    def put_many(self, covers, **tile_params):
+        """
+        :param covers: [(title, cover_path, cover_img)]
+        :return: 依序處理後的 tile
+        """
+        if self.batch_effects:
+            tiles = make_cover_tiles([cover_img for _, _, cover_img in covers], **tile_params)
+        else:
+            tiles = [make_cover_tile(cover_img, **tile_params) for _, _, cover_img in covers]
+        return [self._store(title, cover_path, tile, tile_params) for (title, cover_path, _), tile in zip(covers, tiles)]
+
+    def _store(self, title, cover_path, tile, tile_params):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(title, cover_path, tile_params)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        tile.save(tmp_path, format='PNG', compress_level=1)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += os.path.getsize(path)
+            self.evict()
+        self._remember(path, tile)
+        return tile
+
+    def evict(self):
+        """
+        快取超過容量時，依最後存取時間刪除最舊的 tile
+        """
+        if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+            return
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+
+    def clear(self):
+        self._memory.clear()
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.png'):
+                os.remove(entry.path)
+        self._total_bytes = 0
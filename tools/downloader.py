@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import requests
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+
+class DownloadResult:
+    """
+    一批圖片下載的結果
+    """
+
+    def __init__(self):
+        self.downloaded = []
+        self.failed = {}
+        self.cache_hits = 0
+        self.bytes_downloaded = 0
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __repr__(self):
+        return (f'DownloadResult(downloaded={len(self.downloaded)}, failed={len(self.failed)}, '
+                f'cache_hits={self.cache_hits}, bytes_downloaded={self.bytes_downloaded})')
+
+
+class ImageDownloader:
+    """
+    共用連線池的圖片下載器
+    固定數量的 thread 同時下載，逾時與暫時性錯誤以指數退避重試
+    下載內容以雜湊值存於磁碟快取，同一網址不會重複下載
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, cache_dir='src/.img_cache', max_workers=8, timeout=10, retries=3, backoff=0.5, session=None):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self._lock = threading.Lock()
+        self._index_path = os.path.join(cache_dir, 'index.json') if cache_dir else None
+        self._index = self._load_index()
+
+    def _load_index(self):
+        if not self._index_path or not os.path.exists(self._index_path):
+            return {}
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _read_cache(self, url):
+        digest = self._index.get(url)
+        if not digest:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, digest), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_cache(self, url, content):
+        digest = hashlib.sha256(content).hexdigest()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        blob_path = os.path.join(self.cache_dir, digest)
+        if not os.path.exists(blob_path):
+            with open(f'{blob_path}.tmp{threading.get_ident()}', 'wb') as f:
+                f.write(content)
+            os.replace(f'{blob_path}.tmp{threading.get_ident()}', blob_path)
+
+        with self._lock:
+            self._index[url] = digest
+            with open(f'{self._index_path}.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(f'{self._index_path}.tmp', self._index_path)
+
+    def _get(self, url):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                if response.status_code in self.RETRY_STATUS and attempt < self.retries:
+                    raise requests.exceptions.RetryError(f'HTTP {response.status_code}')
+                response.raise_for_status()
+                return response.content
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.RetryError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def fetch_bytes(self, url):
+        """
+        :return: (圖片內容, 是否來自快取)
+        """
+        if self.cache_dir:
+            content = self._read_cache(url)
+            if content is not None:
+                return content, True
+
+        content = self._get(url)
+        if self.cache_dir:
+            self._write_cache(url, content)
+        return content, False
+
+    def fetch_image(self, url, save_path=None, draft_size=None):
+        """
+        下載並解碼圖片，save_path 存在時另存原始檔案
+        :param draft_size: JPEG 直接解碼為不小於此尺寸的縮小圖
+        :return: (Image, 是否來自快取, 位元組數)
+        """
+        content, from_cache = self.fetch_bytes(url)
+        img = Image.open(BytesIO(content))
+        if draft_size:
+            img.draft('RGB', (draft_size, draft_size))
+        img.load()
+
+        if save_path:
+            with open(save_path, 'wb') as f:
+                f.write(content)
+        return img, from_cache, len(content)
+
+    def submit(self, url, save_path=None, draft_size=None):
+        return self.executor.submit(self.fetch_image, url, save_path, draft_size)
+
+    def download(self, img_download_queue, img_container, draft_size=None):
+        """
+        :param img_download_queue: [key, url, save_path] 列表
+        :param img_container: 下載完成的圖片以 key 存入
+        """
+        result = DownloadResult()
+        futures = [(key, self.submit(url, save_path, draft_size)) for key, url, save_path in img_download_queue]
+
+        for key, future in futures:
+            try:
+                img, from_cache, size = future.result()
+            except Exception as e:
+                result.failed[key] = str(e)
+                continue
+
+            img_container[key] = img
+            result.downloaded.append(key)
+            if from_cache:
+                result.cache_hits += 1
+            else:
+                result.bytes_downloaded += size
+
+        return result
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
@@ -1,11 +1,50 @@
+from functools import lru_cache
+
+from PIL import Image, ImageChops, ImageDraw
+
 from tools.utils import textsize
 
 
+@lru_cache(maxsize=1024)
+def get_text_sprite(text, font, fill, e_fill=(0, 0, 0), ew=1, with_edge=True):
+    """
+    將文字 (含描邊) 繪製成 RGBA sprite，同樣的文字與樣式只繪製一次
+    :return: (sprite, 文字原點在 sprite 中的位置)
+    """
+    left, top, right, bottom = font.getbbox(text)
+    pad = ew if with_edge else 0
+    size = (max(right - left, 0) + pad * 2, max(bottom - top, 0) + pad * 2)
+    origin = (pad - left, pad - top)
+
+    def text_mask(dx=0, dy=0):
+        mask = Image.new('L', size, 0)
+        ImageDraw.Draw(mask).text((origin[0] + dx, origin[1] + dy), text, font=font, fill=255)
+        return mask
+
+    fill_layer = Image.new('RGBA', size, tuple(fill[:3]) + (0,))
+    fill_layer.putalpha(text_mask())
+
+    if not with_edge:
+        return fill_layer, origin
+
+    # 四個方向的描邊合成為一個 alpha: 1 - (1 - a1)(1 - a2)...
+    transparent = None
+    for dx, dy in [(ew, ew), (-ew, ew), (ew, -ew), (-ew, -ew)]:
+        inverted = ImageChops.invert(text_mask(dx, dy))
+        transparent = inverted if transparent is None else ImageChops.multiply(transparent, inverted)
+
+    sprite = Image.new('RGBA', size, tuple(e_fill[:3]) + (0,))
+    sprite.putalpha(ImageChops.invert(transparent))
+    sprite.alpha_composite(fill_layer)
+    return sprite, origin
+
+
 def draw_text_with_edge(
-    draw, coord, text, font, fill, e_fill=(0, 0, 0), side="left", ew=1, with_edge=True
+    draw, coord, text, font, fill, e_fill=(0, 0, 0), side="left", ew=1, with_edge=True, image=None
 ):
     """
     param ew: edge width
+    param image: draw 所繪製的 RGB 圖片，指定時以快取的文字 sprite 貼上
     """
     if side == "right":
         text_width, _ = textsize(text, font)
@@ -14,6 +53,14 @@ def draw_text_with_edge(
         _, text_height = textsize(text, font)
         coord = (coord[0], coord[1] - text_height)
 
+    if not text:
+        return
+
+    if image is not None and image.mode == "RGB":
+        sprite, origin = get_text_sprite(text, font, tuple(fill), tuple(e_fill), ew, with_edge)
+        image.paste(sprite, (int(coord[0]) - origin[0], int(coord[1]) - origin[1]), sprite)
+        return
+
     if with_edge:
         for dx, dy in [(ew, ew), (-ew, ew), (ew, -ew), (-ew, -ew)]:
             draw.text((coord[0] + dx, coord[1] + dy), text, font=font, fill=e_fill)
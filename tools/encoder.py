@@ -0,0 +1,125 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from tools.incremental import save_state
+
+EXTENSIONS = {
+    'png': '.png',
+    'jpeg': '.jpg',
+    'webp': '.webp',
+}
+
+
+class OutputEncoder:
+    """
+    卡片輸出格式設定
+    png: compress_level 0 ~ 9，數值越小壓縮越快、檔案越大
+    jpeg: quality 與 optimize，不含透明度
+    webp: lossless 為 True 時無損壓縮，否則以 quality 有損壓縮
+    """
+
+    def __init__(self, format='png', compress_level=6, quality=90, lossless=False, method=4):
+        if format not in EXTENSIONS:
+            raise ValueError(f'unsupported output format: {format}')
+        self.format = format
+        self.compress_level = compress_level
+        self.quality = quality
+        self.lossless = lossless
+        self.method = method
+
+    @property
+    def extension(self):
+        return EXTENSIONS[self.format]
+
+    @property
+    def is_lossless(self):
+        return self.format == 'png' or (self.format == 'webp' and self.lossless)
+
+    @property
+    def mimetype(self):
+        return f'image/{self.format}'
+
+    def save_kwargs(self):
+        if self.format == 'png':
+            return {'format': 'PNG', 'compress_level': self.compress_level}
+        if self.format == 'jpeg':
+            return {'format': 'JPEG', 'quality': self.quality, 'optimize': True}
+        return {'format': 'WEBP', 'lossless': self.lossless, 'quality': self.quality, 'method': self.method}
+
+    def save(self, img, fp):
+        """
+        :param fp: 檔案路徑或可寫入的檔案物件
+        """
+        if self.format == 'jpeg' and img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.save(fp, **self.save_kwargs())
+
+    def to_bytes(self, img):
+        """
+        將卡片編碼為 bytes，不寫入磁碟
+        """
+        buffer = BytesIO()
+        self.save(img, buffer)
+        return buffer.getvalue()
+
+    def output_path(self, path):
+        """
+        將副檔名替換為輸出格式對應的副檔名
+        """
+        return os.path.splitext(path)[0] + self.extension
+
+
+class BackgroundWriter:
+    """
+    在背景 thread 編碼並寫入卡片，主程序可以同時渲染下一張
+    傳入的圖片之後不可再修改
+    尚未寫入的卡片超過 max_pending 張時 submit 會等待，渲染比編碼快時記憶體不會持續增加
+    """
+
+    def __init__(self, encoder=None, max_workers=1, max_pending=2):
+        self.encoder = encoder or OutputEncoder()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = []
+        self._pending = threading.BoundedSemaphore(max(max_pending, max_workers))
+
+    def submit(self, img, path, state=None):
+        """
+        :param state: B30Render.render_state，寫入卡片旁的 json 供增量繪製使用
+        """
+        self._pending.acquire()
+        try:
+            future = self.executor.submit(self._write, img, path, state)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        self.futures.append(future)
+        return future
+
+    def _write(self, img, path, state=None):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            self.encoder.save(img, f)
+        os.replace(tmp_path, path)
+        if state is not None:
+            save_state(path, state, self.encoder.is_lossless)
+        return path
+
+    def wait(self):
+        """
+        等待所有寫入完成
+        :return: 依提交順序的輸出路徑
+        """
+        futures, self.futures = self.futures, []
+        return [future.result() for future in futures]
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
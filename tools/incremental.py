@@ -0,0 +1,51 @@
+import json
+import os
+
+STATE_VERSION = 1
+
+
+def state_path(image_path):
+    """
+    卡片旁的 json 檔，記錄繪製每個 info box 時使用的資料
+    """
+    return os.path.splitext(image_path)[0] + '.json'
+
+
+def load_state(image_path):
+    try:
+        with open(state_path(image_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_state(image_path, state, lossless=True):
+    """
+    :param lossless: 卡片為有損格式時不可作為下次增量繪製的底圖
+    """
+    path = state_path(image_path)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(dict(state, lossless=lossless), f, ensure_ascii=False)
+    os.replace(f'{path}.tmp', path)
+
+
+def normalize_boxes(box_infos):
+    # 與 json 讀回的資料比較，數值一律轉為字串
+    return [{key: str(value) for key, value in info.items()} for info in box_infos]
+
+
+def changed_boxes(prev_state, state):
+    """
+    比較兩次繪製的資料
+    :return: 內容不同的 info box 索引，版面或背景不同而無法沿用時回傳 None
+    """
+    if not prev_state or prev_state.get('version') != STATE_VERSION or not prev_state.get('lossless'):
+        return None
+
+    for key in state:
+        if key != 'boxes' and prev_state.get(key) != state[key]:
+            return None
+    if len(prev_state.get('boxes', [])) != len(state['boxes']):
+        return None
+
+    return [idx for idx, (prev, new) in enumerate(zip(prev_state['boxes'], state['boxes'])) if prev != new]
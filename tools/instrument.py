@@ -0,0 +1,152 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger('b30')
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """
+    記錄一筆結構化事件，fields 於 JSON 格式時成為同一層的欄位
+    """
+    logger.log(level, event, extra={'fields': fields})
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    每筆事件輸出為一行 JSON
+    """
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    事件名稱後接 key=value，給終端機閱讀
+    """
+
+    def format(self, record):
+        fields = ' '.join(f'{key}={value}' for key, value in getattr(record, 'fields', {}).items())
+        text = f'{record.getMessage()} {fields}'.rstrip()
+        if record.exc_info:
+            text += '\n' + self.formatException(record.exc_info)
+        return text
+
+
+def setup_logging(json_format=False, level=logging.INFO, stream=None):
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format else TextFormatter())
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def peak_rss_mb(children=False):
+    """
+    程序 (或已結束的子程序中最大者) 的最大常駐記憶體，windows 沒有 resource 時回傳 None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # macOS 單位為 bytes，linux 為 KB
+    return round(peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10, 2)
+
+
+class RenderMetrics:
+    """
+    單張卡片的各階段耗時與計數 (快取命中、下載數量、位元組數)
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.box_timings = []
+        self.counters = {}
+        self.profile = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        data = {
+            'timings_ms': {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+        if self.box_timings:
+            data['box_ms'] = [round(seconds * 1000, 2) for seconds in self.box_timings]
+        if self.profile:
+            data['profile'] = self.profile
+        return data
+
+
+@contextmanager
+def profiled(metrics, mode=None, top=20, dump_path=None):
+    """
+    :param mode: None、'cprofile' (函式耗時) 或 'tracemalloc' (記憶體配置)
+    :param dump_path: cProfile 結果另存為 .prof，可用 snakeviz 等工具檢視
+    """
+    if mode is None:
+        yield
+        return
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top)
+            metrics.profile = {'mode': mode, 'stats': output.getvalue()}
+            if dump_path:
+                profiler.dump_stats(dump_path)
+
+    elif mode == 'tracemalloc':
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            metrics.profile = {
+                'mode': mode,
+                'peak_mb': round(peak / 2 ** 20, 2),
+                'top': [str(stat) for stat in snapshot.statistics('lineno')[:top]],
+            }
+
+    else:
+        raise ValueError(f'unknown profiler: {mode}')
@@ -0,0 +1,76 @@
+class LayoutSpec:
+    """
+    卡片版面設定: 歌曲框的行列數與尺寸 (以 scale = 1 的像素為單位)
+    scale 小於 1 時所有尺寸、字體與位移等比例縮小，用於快速產生預覽圖
+    """
+
+    def __init__(self, rows=6, columns=5, box_width=290, box_height=170, padding=30, side_width=520, scale=1.0,
+                 n_boxes=None):
+        self.rows = rows
+        self.columns = columns
+        # 實際繪製的歌曲框數，None 時填滿所有行列
+        self.base_n_boxes = n_boxes
+        self.base_box_width = box_width
+        self.base_box_height = box_height
+        self.base_padding = padding
+        self.base_side_width = side_width
+        self.scale = scale
+
+    @classmethod
+    def best(cls, n, columns=5, **kwargs):
+        """
+        能容納 Best n 的版面，例如 LayoutSpec.best(50)
+        """
+        return cls(rows=-(-n // columns), columns=columns, n_boxes=n, **kwargs)
+
+    def s(self, value):
+        """
+        將 scale = 1 時的像素值換算為目前的尺寸
+        """
+        return int(round(value * self.scale))
+
+    @property
+    def n_boxes(self):
+        if self.base_n_boxes is None:
+            return self.rows * self.columns
+        return min(self.base_n_boxes, self.rows * self.columns)
+
+    @property
+    def box_width(self):
+        return self.s(self.base_box_width)
+
+    @property
+    def box_height(self):
+        return self.s(self.base_box_height)
+
+    @property
+    def padding(self):
+        return self.s(self.base_padding)
+
+    @property
+    def img_width(self):
+        return self.padding + self.columns * (self.box_width + self.padding) + self.s(self.base_side_width)
+
+    @property
+    def img_height(self):
+        return self.padding * (self.rows + 1) + self.box_height * self.rows
+
+    def get_box_coord(self, idx):
+        x = self.padding + (idx % self.columns) * (self.box_width + self.padding)
+        y = self.padding + (idx // self.columns) * (self.box_height + self.padding)
+        return x, y
+
+    def key(self):
+        return (self.rows, self.columns, self.base_box_width, self.base_box_height, self.base_padding,
+                self.base_side_width, self.scale, self.n_boxes)
+
+    def __eq__(self, other):
+        return isinstance(other, LayoutSpec) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return (f'LayoutSpec(rows={self.rows}, columns={self.columns}, box_width={self.base_box_width}, '
+                f'box_height={self.base_box_height}, padding={self.base_padding}, '
+                f'side_width={self.base_side_width}, scale={self.scale}, n_boxes={self.n_boxes})')
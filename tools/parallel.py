@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import ImageDraw
+
+# 每個 worker 程序各自持有一個 B30Render，素材只在程序啟動時載入一次
+_worker_render = None
+
+
+def _init_worker(render_kwargs):
+    global _worker_render
+    from main import B30Render
+
+    _worker_render = B30Render(**render_kwargs)
+
+
+def create_pool(workers, **render_kwargs):
+    """
+    建立渲染用的 ProcessPoolExecutor
+    :param render_kwargs: 傳給 worker 端 B30Render 的參數 (素材路徑等)
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(render_kwargs,))
+
+
+def _render_box_tile(idx, info, cover_tile, base_tile, layout):
+    render = _worker_render
+    if render.layout != layout:
+        render.set_layout(layout)
+    render.image = base_tile
+    render.draw = ImageDraw.Draw(base_tile)
+    render.cover_tiles = {idx: cover_tile} if cover_tile is not None else {}
+    render.draw_info_box(idx, info, (0, 0))
+    return base_tile
+
+
+def render_box_tiles(render, executor, box_infos):
+    """
+    將每個 info box 連同下方的背景裁切為 tile 交給 worker 繪製，再依序貼回畫布
+    tile 範圍包含右側與下方間距，結果與逐格繪製相同
+    """
+    futures = []
+    for idx, info in enumerate(box_infos):
+        region = render.get_box_tile_region(render.get_box_coord(idx))
+        futures.append((region, executor.submit(_render_box_tile, idx, info, render.wait_cover_tile(idx), render.image.crop(region),
+                                                render.layout)))
+        # tile 已交給 worker，主程序不再保留
+        render.cover_tiles.pop(idx, None)
+
+    for region, future in futures:
+        render.image.paste(future.result(), region[:2])
+
+
+def _render_card(job):
+    b30_img = _worker_render.generate_b30(
+        isOnline=job.get('credentials') is not None,
+        score_path=job.get('score_path'),
+        credentials=job.get('credentials'),
+        bg_name=job['bg_name'],
+        profile=job.get('profile'),
+        layout=job.get('layout'),
+        previous=job['out_path'] if job.get('incremental') else None,
+    )
+    if not b30_img:
+        return None
+
+    encoder = job.get('encoder') or _worker_render.encoder
+    out_path = job['out_path'] or f"{job['out_dir']}/{_worker_render.username}{encoder.extension}"
+    _worker_render.save_b30(b30_img, out_path, encoder)
+    return out_path
+
+
+def render_cards(jobs, workers, **render_kwargs):
+    """
+    以多個程序同時渲染多張卡片
+    :param jobs: dict 列表，包含 score_path 或 credentials、bg_name、out_path/out_dir，可另指定 layout
+    :return: 依 jobs 順序的輸出路徑，失敗為 None
+    """
+    with create_pool(workers, **render_kwargs) as executor:
+        return list(executor.map(_render_card, jobs))
@@ -0,0 +1,196 @@
+import glob
+import os
+import re
+import sqlite3
+
+from tools.score_table import read_score_csv
+from tools.scoring import compute_potentials, get_avg_potential, parse_play_dates
+
+# played_at 的格式，與快照時間相同可直接以字串比較
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+# 資料庫版本 1: played_at 由網頁上的日期字串改為 TIMESTAMP_FORMAT
+SCHEMA_VERSION = 1
+
+# score_<玩家>_YYYYMMDD.csv，舊版的 score_YYYYMMDD.csv 沒有玩家名稱
+SNAPSHOT_FILE_RE = re.compile(r'^score_(?:(?P<user>.+)_)?(\d{4})(\d{2})(\d{2})\.csv$')
+
+
+def score_csv_name(username, date):
+    """
+    線上模式儲存成績的檔名，包含玩家名稱，批次模式的多個帳號不會互相覆蓋
+    :param date: YYYYMMDD
+    """
+    return f'score_{file_username(username)}_{date}.csv'
+
+
+def file_username(username):
+    # 檔名中的玩家名稱只保留英數字、. 與 -
+    return re.sub(r'[^0-9A-Za-z.-]', '_', username)
+
+
+class ScoreHistory:
+    """
+    每次取得的成績以 (玩家, 取得時間) 為一筆快照追加至 SQLite，同一天多次取得也各自保留
+    快照的 B30 / R10 平均另存一表，查詢潛力值變化或單一譜面紀錄時只走索引，不需重新讀取所有 csv
+    快照為 YYYY-MM-DD HH:MM:SS，由 csv 匯入的快照只有日期 YYYY-MM-DD
+    """
+
+    def __init__(self, path='src/score_history.sqlite'):
+        self.path = path
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute('CREATE TABLE IF NOT EXISTS snapshots ('
+                     'username TEXT, snapshot TEXT, b30 REAL, r10 REAL, ptt REAL, '
+                     'PRIMARY KEY (username, snapshot))')
+        conn.execute('CREATE TABLE IF NOT EXISTS scores ('
+                     'username TEXT, snapshot TEXT, rank INTEGER, title TEXT, difficulty TEXT, score INTEGER, '
+                     'song_lv REAL, potential REAL, grade TEXT, played_at TEXT, P INTEGER, F INTEGER, L INTEGER)')
+        conn.execute('CREATE INDEX IF NOT EXISTS scores_chart ON scores (title, difficulty, snapshot)')
+        conn.execute('CREATE INDEX IF NOT EXISTS scores_snapshot ON scores (username, snapshot)')
+        if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            self._migrate(conn)
+        return conn
+
+    def _migrate(self, conn):
+        # 舊版的 played_at 為網頁上的日期字串，轉為時間戳記
+        rows = conn.execute('SELECT rowid, played_at FROM scores').fetchall()
+        if rows:
+            played_at = _format_timestamps(parse_play_dates([value for _, value in rows]))
+            conn.executemany('UPDATE scores SET played_at = ? WHERE rowid = ?',
+                             [(value, rowid) for (rowid, _), value in zip(rows, played_at)])
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+
+    def add_snapshot(self, score_data, snapshot, username='User001'):
+        """
+        :param score_data: compute_potentials 處理後的成績表 (B30 在前、R10 在後)
+        :param snapshot: 取得時間 YYYY-MM-DD HH:MM:SS (csv 匯入時為日期 YYYY-MM-DD)
+        """
+        b30 = get_avg_potential(score_data, 'B30')
+        r10 = get_avg_potential(score_data, 'R10')
+        played_at = _format_timestamps(parse_play_dates(score_data['date']))
+
+        rows = []
+        for rank, (row, row_played_at) in enumerate(zip(score_data.itertuples(index=False), played_at), start=1):
+            rows.append((username, snapshot, rank, row.title, row.difficulty, int(row.score),
+                         _to_float(row.song_lv), _to_float(row.potential), str(row.grade), row_played_at,
+                         _to_int(row.P), _to_int(row.F), _to_int(row.L)))
+
+        with self._connect() as conn:
+            # 只有完全相同的取得時間會取代，其他快照都保留
+            conn.execute('DELETE FROM scores WHERE username = ? AND snapshot = ?', (username, snapshot))
+            conn.executemany('INSERT INTO scores VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)',
+                         (username, snapshot, b30, r10, round(r10 * 0.25 + b30 * 0.75, 3)))
+
+    def has_snapshot(self, date, username='User001'):
+        """
+        :param date: YYYY-MM-DD，當天有任何一次快照即為 True
+        """
+        with self._connect() as conn:
+            row = conn.execute('SELECT 1 FROM snapshots WHERE username = ? AND substr(snapshot, 1, 10) = ?',
+                               (username, date)).fetchone()
+        return row is not None
+
+    def ingest_csv(self, file_paths, song_data, username='User001'):
+        """
+        匯入既有的成績 csv，已有快照 (匯入或線上取得) 的日期會略過
+        只匯入 username 的 score_<玩家>_YYYYMMDD.csv，沒有玩家名稱的舊檔案視為 username 的成績
+        :param song_data: SongConstantStore
+        :return: 新增的快照日期
+        """
+        added = []
+        for file_path in sorted(file_paths):
+            match = SNAPSHOT_FILE_RE.search(os.path.basename(file_path))
+            if not match or match.group('user') not in (None, file_username(username)):
+                continue
+            snapshot = '-'.join(match.groups()[1:])
+            if self.has_snapshot(snapshot, username):
+                continue
+
+            score_data = compute_potentials(read_score_csv(file_path), song_data)
+            self.add_snapshot(score_data, snapshot, username)
+            added.append(snapshot)
+        return added
+
+    def ingest_dir(self, score_dir, song_data, username='User001'):
+        return self.ingest_csv(glob.glob(os.path.join(score_dir, 'score_*.csv')), song_data, username)
+
+    def potential_history(self, username='User001'):
+        """
+        :return: [(日期, B30, R10, ptt)]，依日期排序
+        """
+        with self._connect() as conn:
+            return conn.execute('SELECT snapshot, b30, r10, ptt FROM snapshots WHERE username = ? ORDER BY snapshot',
+                                (username,)).fetchall()
+
+    def chart_history(self, title, difficulty, username='User001'):
+        """
+        :return: 單一譜面每次快照的 [(日期, 分數, 潛力值)]
+        """
+        with self._connect() as conn:
+            return conn.execute('SELECT snapshot, score, potential FROM scores '
+                                'WHERE title = ? AND difficulty = ? AND username = ? ORDER BY snapshot',
+                                (title, difficulty, username)).fetchall()
+
+    def snapshots(self, username='User001'):
+        return [row[0] for row in self.potential_history(username)]
+
+    def improvements(self, username='User001', since=None, until=None):
+        """
+        比較兩次快照，列出分數提升或新進榜的譜面
+        :param since: 比較基準的日期 (或快照時間)，取當天最後一次快照，None 時為 until 的前一次快照
+        :param until: 日期 (或快照時間)，取當天最後一次快照，None 時為最新的快照
+        :return: [(title, difficulty, 舊分數, 新分數, 舊潛力值, 新潛力值)]，依潛力值提升排序
+        """
+        snapshots = self.snapshots(username)
+        until = _last_snapshot(snapshots, until)
+        if until is None:
+            return []
+        if since is not None:
+            since = _last_snapshot(snapshots, since)
+            if since is None:
+                return []
+        else:
+            earlier = [snapshot for snapshot in snapshots if snapshot < until]
+            if not earlier:
+                return []
+            since = earlier[-1]
+
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT new.title, new.difficulty, MAX(old.score), MAX(new.score), MAX(old.potential), MAX(new.potential) '
+                'FROM scores AS new LEFT JOIN scores AS old '
+                'ON old.title = new.title AND old.difficulty = new.difficulty AND old.snapshot = ? AND old.username = new.username '
+                'WHERE new.username = ? AND new.snapshot = ? '
+                'GROUP BY new.title, new.difficulty '
+                'HAVING MAX(old.score) IS NULL OR MAX(new.score) > MAX(old.score) '
+                'ORDER BY MAX(new.potential) - COALESCE(MAX(old.potential), 0) DESC',
+                (since, username, until)).fetchall()
+
+
+def _last_snapshot(snapshots, value):
+    """
+    :param snapshots: 依時間排序的快照
+    :return: value 當天 (或之前) 最後一次快照，value 為 None 時為最新的快照
+    """
+    earlier = [snapshot for snapshot in snapshots if value is None or snapshot[:len(value)] <= value]
+    return earlier[-1] if earlier else None
+
+
+def _format_timestamps(played_at):
+    return played_at.dt.strftime(TIMESTAMP_FORMAT).tolist()
+
+
+def _to_float(value):
+    value = float(value)
+    return None if value != value else value
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,154 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from tools.song_store import DIFFICULTIES
+
+SCORE_COLUMNS = ['difficulty', 'title', 'artist', 'grade', 'score', 'date', 'P', 'F', 'L']
+INT_COLUMNS = ['score', 'P', 'F', 'L']
+DIFFICULTY_DTYPE = pd.CategoricalDtype(DIFFICULTIES)
+# 近期最佳 (R10) 的筆數，資料列沒有 recent 欄位時，超過 30 筆的成績表最後這幾筆為 R10
+RECENT_SIZE = 10
+
+# 網頁卡片文字依行拆分後，各欄位所在的行
+CARD_LINES = {
+    2: 'difficulty',
+    4: 'title',
+    6: 'artist',
+    7: 'grade',
+    8: 'score',
+    11: 'date',
+    13: 'P',
+    15: 'F',
+    17: 'L',
+}
+
+GRADE_THRESHOLDS = [(9900000, 'EX+'), (9800000, 'EX'), (9500000, 'AA'), (9200000, 'A'), (8900000, 'B'), (8600000, 'C')]
+
+
+def build_score_table(records):
+    """
+    由資料列一次建立型別固定的成績表: score、P、F、L 為整數，difficulty 為 categorical
+    分數可為 "9,912,345" 或整數，缺少評級時依分數補上
+    recent 欄位標記 R10 的成績 (布林值)，R10 必須在所有最佳成績之後
+    之後的平均與繪製都使用這張表，不再解析字串
+    :param records: dict 列表或 DataFrame，順序為 B30 在前、R10 在後
+    :raises ValueError: 有欄位缺漏或無法轉換的資料列
+    """
+    raw = pd.DataFrame(records)
+    recent = _to_recent(raw['recent'].to_numpy(dtype=object) if 'recent' in raw.columns else None, len(raw))
+    raw = raw.reindex(columns=SCORE_COLUMNS)
+    columns = {column: raw[column].to_numpy(dtype=object, copy=True) for column in SCORE_COLUMNS}
+
+    invalid = pd.isna(columns['title']) | pd.isna(columns['date'])
+    ints = {}
+    for column in INT_COLUMNS:
+        ints[column], bad = _to_int(columns[column])
+        invalid |= bad
+    invalid |= ints['score'] < 0
+
+    difficulty = pd.Categorical(columns['difficulty'], dtype=DIFFICULTY_DTYPE)
+    invalid |= difficulty.codes < 0
+    if invalid.any():
+        raise ValueError(f'invalid score rows: {[int(i) + 1 for i in np.flatnonzero(invalid)]}')
+
+    grade = columns['grade']
+    missing_grade = pd.isna(grade)
+    if missing_grade.any():
+        grade[missing_grade] = get_grades(ints['score'][missing_grade])
+
+    artist = columns['artist']
+    artist[pd.isna(artist)] = ''
+
+    return pd.DataFrame({
+        'difficulty': difficulty,
+        'title': columns['title'].astype(str),
+        'artist': artist.astype(str),
+        'grade': grade.astype(str),
+        'score': ints['score'],
+        'date': columns['date'].astype(str),
+        'P': ints['P'],
+        'F': ints['F'],
+        'L': ints['L'],
+        'recent': recent,
+    })
+
+
+def _to_recent(values, n):
+    """
+    :return: 每列是否為 R10 的布林陣列
+    """
+    if values is None or pd.isna(values).all():
+        recent = np.zeros(n, dtype=bool)
+        if n > 30:
+            recent[-RECENT_SIZE:] = True
+        return recent
+
+    recent = np.array([value is True or str(value).strip().lower() in ('true', '1') for value in values], dtype=bool)
+    if recent.any() and not recent[np.argmax(recent):].all():
+        raise ValueError('recent scores must come after all best scores')
+    return recent
+
+
+def count_best(score_data):
+    """
+    成績表開頭最佳成績 (非 R10) 的筆數
+    """
+    recent = score_data['recent'].to_numpy()
+    return int(np.argmax(recent)) if recent.any() else len(recent)
+
+
+def _to_int(values):
+    """
+    去除千分位逗號後轉為整數
+    :return: (int64 陣列, 無法轉換的位置)
+    """
+    result = np.zeros(len(values), dtype=np.int64)
+    invalid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            result[i] = int(value.replace(',', '')) if isinstance(value, str) else int(value)
+            invalid[i] = isinstance(value, float) and value != int(value)
+        except (TypeError, ValueError, OverflowError):
+            invalid[i] = True
+    return result, invalid
+
+
+def get_grades(scores):
+    """
+    與 utils.get_grade 相同的評級，一次處理整欄整數分數
+    """
+    scores = np.asarray(scores, dtype=np.int64)
+    return np.select([scores >= threshold for threshold, _ in GRADE_THRESHOLDS],
+                     [grade for _, grade in GRADE_THRESHOLDS], 'D').astype(object)
+
+
+def parse_cards(cards):
+    """
+    網頁卡片文字依行拆分為資料列
+    """
+    records = []
+    for card in cards:
+        lines = card.split('\n')
+        records.append({column: lines[line] if line < len(lines) else None for line, column in CARD_LINES.items()})
+    return records
+
+
+def read_score_csv(path):
+    return build_score_table(pd.read_csv(path, dtype=str, keep_default_na=False, na_values=['']))
+
+
+def read_score_json(path):
+    """
+    :param path: 資料列的 json 陣列，或包含 rows 的物件
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return build_score_table(data['rows'] if isinstance(data, dict) else data)
+
+
+def read_scores(path):
+    if path.endswith('.json'):
+        return read_score_json(path)
+    return read_score_csv(path)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from tools.score_table import count_best
+from tools.utils import get_potentials
+
+# 依序嘗試的遊玩日期格式
+PLAY_DATE_FORMATS = [
+    '%Y/%m/%d %p%I:%M',  # windows (Ymd)
+    '%m/%d/%Y %I:%M %p',  # linux (mdY)
+]
+
+
+def compute_potentials(score_data, song_data):
+    """
+    一次查詢整張成績表的定數，計算每筆成績的潛力值
+    :param song_data: SongConstantStore
+    :param score_data: build_score_table 建立的成績表 (score 為整數)
+    :return: 加上 song_lv、potential 欄位的成績表
+    :raises ValueError: 定數表中沒有的歌曲或難度
+    """
+    score_data = score_data.reset_index(drop=True)
+
+    song_lvs = song_data.lookup(score_data['title'], score_data['difficulty'])
+    missing = np.isnan(song_lvs)
+    if missing.any():
+        charts = score_data.loc[missing, ['title', 'difficulty']].itertuples(index=False, name=None)
+        raise ValueError(f'song constants not found: {[(title, str(difficulty)) for title, difficulty in charts]}')
+    scores = score_data['score'].to_numpy(dtype=np.int64)
+
+    return score_data.assign(song_lv=song_lvs, potential=get_potentials(scores, song_lvs))
+
+
+def get_avg_potential(score_data, type='B30'):
+    """
+    B30: 最佳成績前 30 筆潛力值的平均，R10: 近期最佳 (recent) 的平均，沒有標記時為最後 10 筆
+    """
+    if type == 'B30':
+        data = score_data[:min(count_best(score_data), 30)]
+        n = 30
+    elif type == 'R10':
+        data = score_data[score_data['recent']] if score_data['recent'].any() else score_data[-10:]
+        n = 10
+    else:
+        raise ValueError('type must be B30 or R10')
+
+    return round(data['potential'].sum() / n, 3)
+
+
+def parse_play_dates(dates):
+    """
+    一次轉換整欄遊玩日期，上午/下午換為 AM/PM 後依序嘗試 PLAY_DATE_FORMATS
+    :return: datetime64 Series
+    """
+    dates = pd.Series(dates).astype(str).str.replace('下午', 'PM', regex=False).str.replace('上午', 'AM', regex=False)
+    parsed = pd.Series(pd.NaT, index=dates.index, dtype='datetime64[ns]')
+    for fmt in PLAY_DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(dates[missing], format=fmt, errors='coerce')
+
+    if parsed.isna().any():
+        raise ValueError(f'Invalid date format: {dates[parsed.isna()].iloc[0]}')
+    return parsed
+
+
+def format_ages(seconds):
+    """
+    經過的秒數格式化為 "30s"、"5m"、"3h"、"12d"
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    conditions = [seconds < 60, seconds < 3600, seconds < 86400]
+    values = np.select(conditions, [np.trunc(seconds), seconds // 60, seconds // 3600], seconds // 86400)
+    units = np.select(conditions, ['s', 'm', 'h'], 'd')
+    return np.char.add(values.astype(np.int64).astype(str), units)
+
+
+def add_play_ages(score_data, now=None):
+    """
+    以同一個基準時間計算每筆成績距今多久，整張卡片的時間一致
+    :param now: 基準時間 (本地時間)，None 時為現在
+    :return: 加上 played_at (datetime) 與 age (info box 顯示的字串) 欄位的成績表
+    """
+    now = pd.Timestamp.now() if now is None else pd.Timestamp(now)
+    played_at = parse_play_dates(score_data['date'])
+    ages = format_ages((now - played_at).dt.total_seconds().to_numpy())
+    return score_data.assign(played_at=played_at.to_numpy(), age=ages)
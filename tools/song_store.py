@@ -0,0 +1,173 @@
+import csv
+import math
+import os
+import sqlite3
+
+import numpy as np
+
+DIFFICULTIES = ['PST', 'PRS', 'FTR', 'BYD', 'ETR']
+DIFF_INDEX = {diff: col for col, diff in enumerate(DIFFICULTIES)}
+
+
+def to_constant(value) -> float:
+    """
+    將定數表欄位轉為 float，空白或無法解析時為 nan
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return value
+
+
+class SongConstantStore:
+    """
+    歌曲定數表: title -> 五個難度的定數
+    以 SQLite 儲存於磁碟，載入後以 dict 索引 numpy 陣列，查詢為 O(1)
+    """
+
+    def __init__(self, path='src/arcaea_song_level.sqlite'):
+        self.path = path
+        self.titles = []
+        self.index = {}
+        self.constants = np.empty((0, len(DIFFICULTIES)), dtype=np.float64)
+
+    @classmethod
+    def load(cls, path='src/arcaea_song_level.sqlite'):
+        store = cls(path)
+        with store._connect() as conn:
+            rows = conn.execute(f"SELECT title, {', '.join(DIFFICULTIES)} FROM songs ORDER BY rowid").fetchall()
+        store._set_rows(rows)
+        return store
+
+    @classmethod
+    def from_csv(cls, csv_path, path='src/arcaea_song_level.sqlite'):
+        """
+        由舊版的 arcaea_song_level.csv 建立
+        """
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = [[row['title']] + [row[diff] for diff in DIFFICULTIES] for row in reader]
+
+        store = cls(path)
+        store.replace(rows)
+        return store
+
+    def _set_rows(self, rows):
+        titles, constants, index = [], [], {}
+        for row in rows:
+            title = row[0]
+            # 重複的歌名只保留第一筆
+            if title in index:
+                continue
+            index[title] = len(titles)
+            titles.append(title)
+            constants.append([to_constant(value) for value in row[1:1 + len(DIFFICULTIES)]])
+
+        self.titles = titles
+        self.index = index
+        self.constants = np.array(constants, dtype=np.float64).reshape(-1, len(DIFFICULTIES))
+
+    def rows(self):
+        return [[title] + self.constants[i].tolist() for i, title in enumerate(self.titles)]
+
+    def replace(self, rows):
+        """
+        以新的定數表覆蓋並寫入磁碟
+        :param rows: [title, PST, PRS, FTR, BYD, ETR] 列表
+        """
+        self._set_rows(rows)
+        self.save()
+
+    def merge(self, rows):
+        """
+        只合併新增或定數變更的歌曲，並只寫入有變動的資料列
+        :return: (新增數量, 變更數量)
+        """
+        upserts = []
+        added = changed = 0
+        seen = set()
+        for row in rows:
+            title = row[0]
+            # 重複的歌名只保留第一筆
+            if title in seen:
+                continue
+            seen.add(title)
+
+            constants = np.array([to_constant(value) for value in row[1:1 + len(DIFFICULTIES)]], dtype=np.float64)
+            if title not in self.index:
+                self.index[title] = len(self.titles)
+                self.titles.append(title)
+                self.constants = np.vstack([self.constants, constants])
+                added += 1
+            elif not np.array_equal(self.constants[self.index[title]], constants, equal_nan=True):
+                self.constants[self.index[title]] = constants
+                changed += 1
+            else:
+                continue
+            upserts.append(self._db_row(title))
+
+        if upserts:
+            with self._connect() as conn:
+                conn.executemany(f"INSERT INTO songs VALUES (?, {', '.join('?' for _ in DIFFICULTIES)}) "
+                                 f"ON CONFLICT(title) DO UPDATE SET {', '.join(f'{diff} = excluded.{diff}' for diff in DIFFICULTIES)}",
+                                 upserts)
+        return added, changed
+
+    def _db_row(self, title):
+        return [title] + [None if math.isnan(v) else v for v in self.constants[self.index[title]]]
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS songs (title TEXT PRIMARY KEY, {', '.join(f'{diff} REAL' for diff in DIFFICULTIES)})")
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        return conn
+
+    def save(self):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM songs')
+            conn.executemany(f"INSERT INTO songs VALUES (?, {', '.join('?' for _ in DIFFICULTIES)})",
+                             [self._db_row(title) for title in self.titles])
+
+    def get_meta(self, key):
+        """
+        讀取定數表來源的中繼資料 (ETag、Last-Modified、內容雜湊)
+        """
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as conn:
+            row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, **values):
+        with self._connect() as conn:
+            conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                             [(key, value) for key, value in values.items() if value is not None])
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __contains__(self, title):
+        return title in self.index
+
+    def get(self, title, difficulty) -> float:
+        return self.constants[self.index[title], DIFF_INDEX[difficulty]]
+
+    def missing(self, titles) -> set:
+        """
+        回傳定數表中不存在的歌名
+        """
+        return set(titles) - self.index.keys()
+
+    def lookup(self, titles, difficulties) -> np.ndarray:
+        """
+        批次查詢定數，不存在的歌名或難度為 nan
+        """
+        rows = np.array([self.index.get(title, -1) for title in titles], dtype=np.int64)
+        cols = np.array([DIFF_INDEX.get(diff, -1) for diff in difficulties], dtype=np.int64)
+
+        found = (rows >= 0) & (cols >= 0)
+        song_lvs = np.full(len(rows), np.nan)
+        song_lvs[found] = self.constants[rows[found], cols[found]]
+        return song_lvs
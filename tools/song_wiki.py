@@ -0,0 +1,115 @@
+import codecs
+import hashlib
+from html.parser import HTMLParser
+
+import requests
+
+WIKI_URL = 'https://arcwiki.mcd.blue/%E5%AE%9A%E6%95%B0%E8%AF%A6%E8%A1%A8'
+
+
+class SongTableParser(HTMLParser):
+    """
+    串流解析 arcwiki 定數表，只讀取第一個 tbody，每列取前六格 (歌名與五個難度定數)
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.done = False
+        self._in_tbody = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'tbody':
+            self._in_tbody = True
+        elif self._in_tbody and tag == 'tr':
+            self._row = []
+        elif self._row is not None and tag in ('td', 'th'):
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if self.done or not self._in_tbody:
+            return
+        if tag in ('td', 'th') and self._cell is not None:
+            self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row[:6])
+            self._row = None
+        elif tag == 'tbody':
+            self.done = True
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_song_table(chunks):
+    """
+    :param chunks: 可迭代的 HTML 文字片段
+    :return: (定數表資料列, 內容雜湊)
+    """
+    parser = SongTableParser()
+    content_hash = hashlib.sha1()
+    for chunk in chunks:
+        content_hash.update(chunk.encode('utf-8'))
+        if not parser.done:
+            parser.feed(chunk)
+    parser.close()
+
+    # 第一列為表頭
+    rows = [row for row in parser.rows[1:] if len(row) == 6]
+    return rows, content_hash.hexdigest()
+
+
+def _decode_stream(response, chunk_size=64 * 1024):
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def update_from_html(store, chunks):
+    """
+    以已取得的 HTML (例如存檔的頁面) 更新定數表
+    :return: dict，包含 status、added、changed
+    """
+    if isinstance(chunks, str):
+        chunks = [chunks]
+
+    rows, content_hash = parse_song_table(chunks)
+    if content_hash == store.get_meta('content_hash'):
+        return {'status': 'unchanged', 'added': 0, 'changed': 0}
+
+    added, changed = store.merge(rows)
+    store.set_meta(content_hash=content_hash)
+    return {'status': 'updated', 'added': added, 'changed': changed}
+
+
+def update_song_data(store, session=None, url=WIKI_URL, headers=None, timeout=30):
+    """
+    增量更新定數表，頁面未變動 (304 或內容雜湊相同) 時不做任何寫入
+    :return: dict，包含 status、added、changed
+    """
+    session = session or requests.Session()
+    headers = dict(headers or {})
+
+    etag = store.get_meta('etag')
+    last_modified = store.get_meta('last_modified')
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 304:
+            return {'status': 'not_modified', 'added': 0, 'changed': 0}
+        response.raise_for_status()
+
+        result = update_from_html(store, _decode_stream(response))
+        store.set_meta(etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+
+    return result
@@ -1,56 +1,8 @@
-import threading
-import time
-from datetime import datetime
-from io import BytesIO
+from functools import lru_cache
 
-import requests
+import numpy as np
 from PIL import Image, ImageDraw, ImageEnhance
 
-def check_date_fmt(date_str):
-    formats = {
-        "%Y/%m/%d %p%I:%M": "Ymd",
-        "%m/%d/%Y %I:%M %p": "mdY"
-    }
-    for fmt, fmt_name in formats.items():
-        try:
-            datetime.strptime(date_str, fmt)
-            return fmt_name
-        except ValueError:
-            continue
-    return 0
-
-def get_d_time(date: str) -> str:
-    if date.split(" ")[1][:2] == "下午":
-        date = date.replace("下午", "PM")
-    else:
-        date = date.replace("上午", "AM")
-
-    data_fmt = check_date_fmt(date)
-
-    if data_fmt == "Ymd":
-        # windows
-        date_obj = datetime.strptime(date, "%Y/%m/%d %p%I:%M")
-    elif data_fmt == "mdY":
-        # linux
-        date_obj = datetime.strptime(date, "%m/%d/%Y %I:%M %p")
-    else:
-        raise ValueError("Invalid date format")
-
-    timestamp = int(date_obj.timestamp())
-
-    d_time = time.time() - timestamp
-    if d_time < 60:
-        date = f"{int(d_time)}s"
-    elif d_time < 3600:
-        date = f"{int(d_time // 60)}m"
-    elif d_time < 86400:
-        date = f"{int(d_time // 3600)}h"
-    else:
-        date = f"{int(d_time // 86400)}d"
-
-    return date
-
-
 def adjust_opacity(image, opacity):
     """
     調整圖片的透明度
@@ -64,14 +16,24 @@ def adjust_opacity(image, opacity):
     return image
 
 
-def get_potential(score: str, song_lv: float) -> float:
-    score = int(score.replace(",", ""))
-    if score >= 10000000:
-        return song_lv + 2
-    elif score >= 9800000:
-        return round(song_lv + 1 + (score - 9800000) / 200000, 3)
-    elif score < 9800000:
-        return max(round(song_lv + (score - 9500000) / 300000, 3), 0)
+def get_potentials(scores: np.ndarray, song_lvs: np.ndarray) -> np.ndarray:
+    """
+    依分數與譜面定數計算單曲潛力值，一次處理整欄
+    :param scores: 整數分數陣列
+    :param song_lvs: 對應的譜面定數陣列
+    """
+    scores = np.asarray(scores, dtype=np.int64)
+    song_lvs = np.asarray(song_lvs, dtype=np.float64)
+
+    return np.where(
+        scores >= 10000000,
+        song_lvs + 2,
+        np.where(
+            scores >= 9800000,
+            np.round(song_lvs + 1 + (scores - 9800000) / 200000, 3),
+            np.maximum(np.round(song_lvs + (scores - 9500000) / 300000, 3), 0),
+        ),
+    )
 
 
 def get_grade(score: int) -> str:
@@ -92,33 +54,6 @@ def get_grade(score: int) -> str:
         return "D"
 
 
-def download_image(url, img_container, key, save_path=None):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()  # 如果狀態碼不是 200，這行會拋出 HTTPError
-
-        img = Image.open(BytesIO(response.content))
-        if save_path:
-            img.save(save_path)
-        img_container[key] = img
-
-    except requests.exceptions.RequestException:
-        pass
-
-
-def download_images_multithreaded(img_download_queue, img_container):
-    threads = []
-    for idx, img_url, save_path in img_download_queue:
-        thread = threading.Thread(
-            target=download_image, args=(img_url, img_container, idx, save_path)
-        )
-        threads.append(thread)
-        thread.start()
-
-    for thread in threads:
-        thread.join()
-
-
 def parse_cookies(cookie_string, domain=".example.com"):
     cookies = []
     for cookie in cookie_string.split("; "):
@@ -127,6 +62,7 @@ def parse_cookies(cookie_string, domain=".example.com"):
     return cookies
 
 
+@lru_cache(maxsize=4096)
 def textsize(text, font):
     im = Image.new(mode="P", size=(0, 0))
     draw = ImageDraw.Draw(im)
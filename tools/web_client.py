@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tools.utils import get_grade
+
+DIFFICULTY_NAMES = ['PST', 'PRS', 'FTR', 'BYD', 'ETR']
+
+
+class LoginError(Exception):
+    pass
+
+
+class ArcaeaWebClient:
+    """
+    以 requests.Session 直接呼叫 Arcaea Online 的 web API 取得潛力值與個人資料，不需啟動瀏覽器
+    base_url 可指向本機的替代伺服器以便測試
+    """
+
+    def __init__(self, base_url='https://webapi.lowiro.com', session=None, user_agent=None, timeout=10,
+                 jacket_url_template=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.jacket_url_template = jacket_url_template
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+
+    def _get_value(self, path):
+        response = self.session.get(f'{self.base_url}{path}', timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get('success', True):
+            raise requests.exceptions.RequestException(f'{path}: {data}')
+        return data.get('value', data)
+
+    def login(self, username, password):
+        self.session.cookies.clear()
+        response = self.session.post(f'{self.base_url}/auth/login', auth=(username, password), timeout=self.timeout)
+        if response.status_code in (401, 403):
+            raise LoginError('login failed')
+        response.raise_for_status()
+
+        data = response.json()
+        if not data.get('isLoggedIn', data.get('success', False)):
+            raise LoginError('login failed')
+
+    def get_profile(self):
+        return self._get_value('/webapi/user/me')
+
+    def get_rating(self):
+        return self._get_value('/webapi/score/rating/me')
+
+    def to_score_row(self, score):
+        """
+        將 API 的成績資料轉為與網頁卡片相同欄位的資料列
+        """
+        title = score.get('title')
+        if isinstance(title, dict):
+            title = title.get('en') or next(iter(title.values()))
+
+        score_str = f"{int(score['score']):,}"
+        played = datetime.fromtimestamp(score['time_played'] / 1000)
+
+        return {
+            'difficulty': DIFFICULTY_NAMES[score['difficulty']],
+            'title': title,
+            'artist': score.get('artist', ''),
+            'grade': get_grade(score_str),
+            'score': score_str,
+            'date': played.strftime('%Y/%m/%d %p%I:%M'),
+            'P': str(score.get('perfect_count', 0)),
+            'F': str(score.get('near_count', 0)),
+            'L': str(score.get('miss_count', 0)),
+        }
+
+    def get_jacket_url(self, score):
+        if score.get('jacket_url'):
+            return score['jacket_url']
+        if self.jacket_url_template:
+            return self.jacket_url_template.format(**score)
+        return None
+
+    def fetch(self, username, password):
+        """
+        登入並取得 B30 / R10 成績與個人資料
+        :return: dict，包含 username、rows (B30 在前、R10 在後)、img_src_arr 與 avatar/rating_bg/banner 圖片網址
+        """
+        self.login(username, password)
+
+        profile = self.get_profile()
+        rating = self.get_rating()
+
+        n_best = len(rating.get('best_rated_scores', []))
+        scores = rating.get('best_rated_scores', []) + rating.get('recent_rated_scores', [])
+
+        return {
+            'username': profile.get('display_name') or profile.get('name', username),
+            'rows': [dict(self.to_score_row(score), recent=idx >= n_best) for idx, score in enumerate(scores)],
+            'img_src_arr': [self.get_jacket_url(score) for score in scores],
+            'avatar_url': profile.get('avatar_url'),
+            'rating_bg_url': profile.get('rating_bg_url'),
+            'banner_url': profile.get('banner_url'),
+        }